@@ -0,0 +1,210 @@
+"""Local stand-ins for the AssemblyAI APIs, so transcription modes can be tested offline.
+
+RealtimeStandIn speaks the realtime websocket protocol closely enough for
+assemblyai.RealtimeTranscriber. BatchStandIn serves the upload and
+transcript endpoints of the batch API, finishing each transcript after a
+fixed processing delay and calling its webhook, if it has one. Neither can
+recognize speech, so everything is transcribed as a fixed text; the realtime
+one reveals it word by word in partial transcripts as audio arrives.
+
+Usage:
+    python assemblyai_standin.py [--port 8765] [--http-port 8766]
+then point AssemblyAITranscriber(realtime_url="ws://127.0.0.1:8765") and
+aai.settings.base_url = "http://127.0.0.1:8766" at them.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+from websockets.sync.server import serve
+
+class RealtimeStandIn:
+    """Websocket server imitating the AssemblyAI realtime endpoint."""
+
+    def __init__(self, transcript="hello from the stand in", port=0, sample_rate=16000, ms_per_word=300):
+        self.words = transcript.split()
+        self.port = port  # 0 picks a free port
+        self.sample_rate = sample_rate
+        self.ms_per_word = ms_per_word  # Audio needed before the next word shows up in a partial
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.server = serve(self._handle, "127.0.0.1", self.port)
+        self.port = self.server.socket.getsockname()[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.thread.join()
+
+    def _handle(self, websocket):
+        now = datetime.now(timezone.utc)
+        websocket.send(json.dumps({
+            'message_type': 'SessionBegins',
+            'session_id': str(uuid.uuid4()),
+            'expires_at': (now + timedelta(hours=1)).isoformat(),
+        }))
+        audio_ms = 0  # Audio received in the current utterance
+        utterance_start = 0
+        for message in websocket:
+            if isinstance(message, bytes):
+                audio_ms += len(message) * 1000 // (self.sample_rate * 2)
+                websocket.send(json.dumps(self._transcript('PartialTranscript', utterance_start, audio_ms)))
+                continue
+            request = json.loads(message)
+            if request.get('force_end_utterance') and audio_ms:
+                websocket.send(json.dumps(self._transcript('FinalTranscript', utterance_start, audio_ms)))
+                utterance_start += audio_ms
+                audio_ms = 0
+            elif request.get('terminate_session'):
+                websocket.send(json.dumps({'message_type': 'SessionTerminated'}))
+                break
+
+    def _transcript(self, message_type, start, audio_ms):
+        final = message_type == 'FinalTranscript'
+        count = len(self.words) if final else min(len(self.words), audio_ms // self.ms_per_word)
+        words = [{'start': start + i * self.ms_per_word, 'end': start + (i + 1) * self.ms_per_word,
+                  'confidence': 1.0, 'text': word} for i, word in enumerate(self.words[:count])]
+        message = {
+            'message_type': message_type,
+            'audio_start': start,
+            'audio_end': start + audio_ms,
+            'confidence': 1.0,
+            'text': ' '.join(self.words[:count]),
+            'words': words,
+            'created': datetime.now(timezone.utc).isoformat(),
+        }
+        if final:
+            message.update(punctuated=False, text_formatted=False)
+        return message
+
+class BatchStandIn:
+    """HTTP server imitating the AssemblyAI upload and transcript endpoints."""
+
+    def __init__(self, transcript="hello from the stand in", port=0, processing_ms=1000):
+        self.text = transcript
+        self.port = port  # 0 picks a free port
+        self.processing_ms = processing_ms  # Time from a transcript request to its completion
+        self.uploads = {}  # Upload URL -> bytes received
+        self.transcripts = {}  # Transcript id -> request, plus when it completes
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                standin._post(self)
+
+            def do_GET(self):
+                standin._get(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.thread.join()
+
+    def _post(self, request):
+        body = self._read_body(request)
+        if request.path == '/v2/upload':
+            upload_url = f"{self.url}/uploads/{uuid.uuid4()}"
+            self.uploads[upload_url] = body
+            self._reply(request, {'upload_url': upload_url})
+        elif request.path == '/v2/transcript':
+            params = json.loads(body)
+            transcript_id = str(uuid.uuid4())
+            params.update(id=transcript_id, completes_at=time.time() + self.processing_ms / 1000)
+            self.transcripts[transcript_id] = params
+            if params.get('webhook_url'):
+                threading.Timer(self.processing_ms / 1000, self._call_webhook, (transcript_id,)).start()
+            self._reply(request, self._transcript(transcript_id))
+        else:
+            self._reply(request, {'error': 'Not found'}, 404)
+
+    def _get(self, request):
+        transcript_id = request.path.rsplit('/', 1)[-1]
+        if request.path.startswith('/v2/transcript/') and transcript_id in self.transcripts:
+            self._reply(request, self._transcript(transcript_id))
+        else:
+            self._reply(request, {'error': 'Not found'}, 404)
+
+    def _transcript(self, transcript_id):
+        params = self.transcripts[transcript_id]
+        done = time.time() >= params['completes_at']
+        transcript = {key: value for key, value in params.items() if key != 'completes_at'}
+        transcript.update(status='completed' if done else 'processing', text=self.text if done else None)
+        return transcript
+
+    def _call_webhook(self, transcript_id):
+        params = self.transcripts[transcript_id]
+        headers = {}
+        if params.get('webhook_auth_header_name'):
+            headers[params['webhook_auth_header_name']] = params['webhook_auth_header_value']
+        try:
+            httpx.post(params['webhook_url'], json={'transcript_id': transcript_id, 'status': 'completed'},
+                       headers=headers)
+        except httpx.HTTPError as e:
+            print(f"Stand-in webhook call failed: {e}")
+
+    @staticmethod
+    def _read_body(request):
+        if request.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int(request.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    request.rfile.readline()
+                    return bytes(body)
+                body += request.rfile.read(size)
+                request.rfile.readline()
+        return request.rfile.read(int(request.headers.get('Content-Length', 0)))
+
+    @staticmethod
+    def _reply(request, message, status=200):
+        body = json.dumps(message).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local stand-ins for the AssemblyAI realtime and batch APIs.")
+    parser.add_argument('--port', type=int, default=8765, help="Realtime websocket port")
+    parser.add_argument('--http-port', type=int, default=8766, help="Batch API port")
+    parser.add_argument('--processing-ms', type=int, default=1000, help="How long each batch transcript takes")
+    parser.add_argument('--transcript', default="hello from the stand in")
+    args = parser.parse_args()
+    standin = RealtimeStandIn(args.transcript, args.port).start()
+    batch_standin = BatchStandIn(args.transcript, args.http_port, args.processing_ms).start()
+    print(f"Realtime stand-in listening on {standin.url}, batch stand-in on {batch_standin.url}")
+    standin.thread.join()
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,203 @@
+import queue
+import subprocess
+import threading
+from concurrent.futures import TimeoutError
 import assemblyai as aai
+from transcript_completion import TranscriptCompletion
+
+# ffmpeg output options for each compressed upload format
+UPLOAD_ENCODINGS = {
+    'flac': ['-c:a', 'flac', '-compression_level', '5', '-f', 'flac'],
+    'opus': ['-c:a', 'libopus', '-b:a', '24k', '-application', 'voip', '-f', 'ogg'],
+}
+
+class UploadEncoder:
+    """Compresses a recording with ffmpeg while it is being captured.
+
+    Frames are piped to ffmpeg as they arrive, so by the time recording stops
+    only the last few frames are left to encode before the upload can start.
+    """
+
+    def __init__(self, encoding='flac', sample_rate=16000, sink=None):
+        self.encoding = encoding
+        self.output = bytearray()
+        self.sink = sink  # Also called with each piece of encoded output, e.g. ChunkedUpload.feed
+        self.error = None
+        self.process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "quiet", "-threads", "1",
+             "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "-"]
+            + UPLOAD_ENCODINGS[encoding] + ["-"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        # Drain ffmpeg's output as it goes so the pipe never fills up and stalls the recorder
+        self.output_thread = threading.Thread(target=self._collect, daemon=True)
+        self.output_thread.start()
+
+    def feed(self, frames):
+        """Encodes int16 PCM frames; intended as an AudioRecorder frame handler."""
+        if self.error is None:
+            try:
+                self.process.stdin.write(frames)
+            except OSError as e:
+                self.error = e
+
+    def finish(self):
+        """Flushes the encoder and returns the compressed file, or None if encoding failed."""
+        try:
+            self.process.stdin.close()
+        except OSError as e:
+            self.error = e
+        self.output_thread.join()
+        if self.process.wait() != 0 and self.error is None:
+            self.error = f"ffmpeg exited with status {self.process.returncode}"
+        if self.error is not None:
+            print(f"Encoding the recording as {self.encoding} failed: {self.error}")
+            return None
+        return self.output
+
+    def _collect(self):
+        while True:
+            data = self.process.stdout.read1(65536)
+            if not data:
+                break
+            self.output += data
+            if self.sink is not None:
+                self.sink(data)
+
+class ChunkedUpload:
+    """Uploads a recording while it is still being captured, as one chunked HTTP request.
+
+    By the time recording stops, nearly all of the audio is already on
+    AssemblyAI's side and only the transcript request is left to make.
+    """
+
+    def __init__(self, http_client, header=b''):
+        self.http_client = http_client
+        self.chunks = queue.Queue()
+        self.upload_url = None
+        self.error = None
+        if header:
+            self.chunks.put(bytes(header))
+        self.thread = threading.Thread(target=self._upload, daemon=True)
+        self.thread.start()
+
+    def feed(self, data):
+        """Queues audio bytes to send; intended as an AudioRecorder frame handler."""
+        self.chunks.put(bytes(data))
+
+    def finish(self, timeout=30.0):
+        """Ends the upload and returns its URL, or None if it failed."""
+        self.chunks.put(None)
+        self.thread.join(timeout)
+        if self.upload_url is None:
+            print(f"Upload while recording failed: {self.error or 'timed out'}")
+        return self.upload_url
+
+    def cancel(self):
+        """Ends the upload without waiting for it, when its audio is no longer needed."""
+        self.chunks.put(None)
+
+    def _body(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return
+            # Whatever else is already queued goes out in the same HTTP chunk
+            pending = [chunk]
+            try:
+                while True:
+                    chunk = self.chunks.get_nowait()
+                    if chunk is None:
+                        yield b''.join(pending)
+                        return
+                    pending.append(chunk)
+            except queue.Empty:
+                pass
+            yield b''.join(pending)
+
+    def _upload(self):
+        try:
+            self.upload_url = aai.api.upload_file(self.http_client, self._body())
+        except Exception as e:
+            self.error = e
+
+class StreamingTranscription:
+    """A realtime transcription session fed with audio while the user is still talking.
+
+    Audio can be fed straight away; it is queued until the websocket connects,
+    which happens in the background so the recording is never held up.
+    """
+
+    def __init__(self, sample_rate=16000, client=None, chunk_ms=100):
+        self.finals = []  # Final transcript texts, in order
+        self.partial = ""  # Latest partial transcript of the utterance in progress
+        self.error = None
+        self.final_received = threading.Event()
+        # The realtime API wants chunks of at least 100 ms, so small frames are batched
+        self.chunk_bytes = sample_rate * 2 * chunk_ms // 1000
+        self.pending = bytearray()
+        self.transcriber = aai.RealtimeTranscriber(
+            sample_rate=sample_rate,
+            on_data=self._on_data,
+            on_error=self._on_error,
+            client=client,
+        )
+        self.connect_thread = threading.Thread(target=self.transcriber.connect, daemon=True)
+        self.connect_thread.start()
+
+    def feed(self, frames):
+        """Streams int16 PCM frames; intended as an AudioRecorder frame handler."""
+        self.pending += frames
+        if len(self.pending) >= self.chunk_bytes:
+            self.transcriber.stream(bytes(self.pending))
+            self.pending.clear()
+
+    def finish(self, timeout=2.0):
+        """Ends the session and returns the full transcript, or None if streaming failed."""
+        if self.pending:
+            self.transcriber.stream(bytes(self.pending))
+            self.pending.clear()
+        self.connect_thread.join(timeout)
+        if self.error is None:
+            # Ask for the utterance in progress to be finalized now rather than after its silence timeout
+            self.final_received.clear()
+            self.transcriber.force_end_utterance()
+            # With no partial transcript there may be no final coming, so only wait briefly then
+            if not self.final_received.wait(timeout if self.partial else 0.3) and self.partial:
+                print("Timed out waiting for the final transcript.")
+        # Closing joins the socket threads, which can take a second; the turn need not wait for it
+        threading.Thread(target=self.transcriber.close, daemon=True).start()
+        if self.error is not None:
+            print(f"Streaming transcription failed: {self.error}")
+            return None
+        return ' '.join(text for text in self.finals if text)
+
+    def _on_data(self, transcript):
+        if isinstance(transcript, aai.RealtimeFinalTranscript):
+            self.finals.append(transcript.text)
+            self.partial = ""
+            self.final_received.set()
+        else:
+            self.partial = transcript.text
+
+    def _on_error(self, error):
+        self.error = error
+        self.final_received.set()
 
 class AssemblyAITranscriber:
-    def __init__(self, api_key):
+    def __init__(self, api_key, realtime_url=None, upload_encoding=None, webhook_url=None, webhook_port=8000):
         # Set the API key globally for the assemblyai package
         aai.settings.api_key = api_key
+        # Compress recordings before upload ('flac' or 'opus'); raw WAV when None
+        if upload_encoding and upload_encoding not in UPLOAD_ENCODINGS:
+            raise ValueError(f"Unknown upload encoding: {upload_encoding}")
+        self.upload_encoding = upload_encoding
+        # Batch transcripts are picked up by adaptive polling, or by webhook when webhook_url
+        # (a public URL forwarded to webhook_port) is set
+        self.completion = TranscriptCompletion(webhook_url=webhook_url, webhook_port=webhook_port).start()
+        # Realtime sessions go to realtime_url when set (e.g. a local stand-in), otherwise to AssemblyAI
+        self.realtime_client = None
+        if realtime_url:
+            self.realtime_client = aai.Client(settings=aai.Settings(api_key=api_key, base_url=realtime_url))
 
     def transcribe_audio_file(self, audio_file_path):
         # Instantiate the Transcriber object
@@ -17,6 +211,66 @@ class AssemblyAITranscriber:
         else:
             return transcript.text
 
+    def transcribe_audio(self, audio_data):
+        """Transcribes an in-memory audio file (e.g. RecordingBuffer.wav()) without writing it to disk.
+
+        Returns None if it could not be transcribed.
+        """
+        try:
+            # Uploaded straight from the buffer; httpx streams the view without copying it
+            upload_url = aai.api.upload_file(aai.Client.get_default().http_client, [audio_data])
+        except Exception as e:
+            print(f"Upload failed: {e}")
+            return None
+        return self._transcribe(upload_url)
+
+    def start_upload(self, header=b''):
+        """Opens an upload to stream a recording into while it is captured."""
+        return ChunkedUpload(aai.Client.get_default().http_client, header)
+
+    def transcribe_uploaded(self, upload_url, start_ms=None, end_ms=None):
+        """Transcribes audio uploaded earlier, optionally only between start_ms and end_ms. None on failure."""
+        return self._transcribe(upload_url, aai.TranscriptionConfig(audio_start_from=start_ms, audio_end_at=end_ms))
+
+    def _transcribe(self, audio_url, config=None, timeout=60):
+        future = self.completion.submit(audio_url, config)
+        try:
+            transcript = future.result(timeout)
+        except TimeoutError:
+            print(f"Transcription timed out after {timeout} s.")
+            self.completion.cancel(future)
+            return None
+        except Exception as e:
+            print(f"Transcription failed: {e}")
+            return None
+        if transcript.status == aai.TranscriptStatus.error:
+            print(f"Transcription failed: {transcript.error}")
+            return None
+        else:
+            return transcript.text
+
+    def start_encoding(self, sample_rate=16000, sink=None):
+        """Starts compressing a recording for upload as it is captured, or returns None for raw WAV uploads."""
+        if not self.upload_encoding:
+            return None
+        try:
+            return UploadEncoder(self.upload_encoding, sample_rate, sink)
+        except OSError as e:
+            print(f"Could not start ffmpeg, uploading raw WAV instead: {e}")
+            return None
+
+    def encode(self, pcm, sample_rate=16000):
+        """Compresses a finished recording in one go; returns None if it cannot be compressed."""
+        encoder = self.start_encoding(sample_rate)
+        if encoder is None:
+            return None
+        encoder.feed(pcm)
+        return encoder.finish()
+
+    def start_streaming(self, sample_rate=16000):
+        """Opens a realtime session to feed with frames while recording."""
+        return StreamingTranscription(sample_rate=sample_rate, client=self.realtime_client)
+
 # The following testing code should be commented out or removed in the integration
 # if __name__ == "__main__":
 #     transcriber = AssemblyAITranscriber(api_key="9c45c5934f8f4dcd9c13c54875145c77")
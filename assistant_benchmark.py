@@ -0,0 +1,65 @@
+"""Benchmark of the per-turn overhead of reaching the assistant.
+
+Each turn's first request (creating a conversation thread) is timed two
+ways: with a new OpenAI client built for the turn, as the assistant stage
+used to do, and with the process-lifetime pooled client from
+assistant_manager.create_client(), whose connection is kept alive between
+turns. The difference is mostly connection setup and the TLS handshake.
+The threads created are deleted afterwards.
+
+Usage:
+    OPENAI_API_KEY=... python assistant_benchmark.py [--turns 10] [--gap 5]
+"""
+import argparse
+import os
+import time
+import openai
+from assistant_manager import create_client
+
+def time_turns(get_client, turns, gap):
+    """Returns the first-request latency of each turn in seconds, and the threads created."""
+    latencies, thread_ids = [], []
+    for turn in range(turns):
+        if turn:
+            time.sleep(gap)  # Idle time between turns
+        start = time.perf_counter()
+        client = get_client()
+        thread = client.beta.threads.create()
+        latencies.append(time.perf_counter() - start)
+        thread_ids.append(thread.id)
+    return latencies, thread_ids
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-turn assistant overhead with and without a pooled client.")
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--gap', type=float, default=5.0, help="Seconds between turns")
+    parser.add_argument('--base-url', default=None, help="API base URL, e.g. a proxy")
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    pooled = create_client(api_key=api_key)
+    if args.base_url:
+        pooled = pooled.with_options(base_url=args.base_url)
+    # Warm the pool, as AssistantService.warm_up() does at startup
+    created = [pooled.beta.threads.create().id]
+    modes = [
+        ("new client per turn", lambda: openai.OpenAI(api_key=api_key, base_url=args.base_url)),
+        ("pooled client", lambda: pooled),
+    ]
+    try:
+        print(f"{'mode':<22} {'mean':>8} {'median':>8} {'max':>8}")
+        for name, get_client in modes:
+            latencies, thread_ids = time_turns(get_client, args.turns, args.gap)
+            created += thread_ids
+            latencies.sort()
+            print(f"{name:<22} {sum(latencies) / len(latencies) * 1000:>5.0f} ms "
+                  f"{latencies[len(latencies) // 2] * 1000:>5.0f} ms {latencies[-1] * 1000:>5.0f} ms")
+    finally:
+        for thread_id in created:
+            try:
+                pooled.beta.threads.delete(thread_id)
+            except Exception as e:
+                print(f"Could not delete thread {thread_id}: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
+import queue
+import threading
+import time
+from functools import partial
+import httpx
 import openai
+from sentence_segmenter import SentenceSegmenter
+from speech_ledger import SpeechLedger
 from openai.lib.streaming import AssistantEventHandler
 from openai.types.beta import Assistant, Thread
 from openai.types.beta.threads import Run, RequiredActionFunctionToolCall
 from openai.types.beta.assistant_stream_event import (
-    ThreadRunRequiresAction, ThreadMessageDelta, ThreadRunCompleted,
+    ThreadRunCreated, ThreadRunRequiresAction, ThreadMessageDelta, ThreadMessageCompleted, ThreadRunCompleted,
     ThreadRunFailed, ThreadRunCancelling, ThreadRunCancelled, ThreadRunExpired, ThreadRunStepFailed,
     ThreadRunStepCancelled)
 
@@ -35,12 +42,19 @@ class EventHandler(AssistantEventHandler):
                         print(f"\n{output.logs}", flush=True)
 
 class AssistantManager:
-    def __init__(self, client, eleven_labs_manager, thread_id=None, assistant_id=None):
+    def __init__(self, client, eleven_labs_manager, thread_id=None, assistant_id=None, text_handler=None,
+                 speech_ledger=None):
         self.client = client
         self.eleven_labs_manager = eleven_labs_manager  # ElevenLabsManager instance for text-to-speech
+        # Receives each reply text to be spoken; the orchestrator passes its TTS queue here
+        self.text_handler = text_handler if text_handler else eleven_labs_manager.play_text
+        # Shared with every other path that speaks replies, so no text is spoken twice
+        self.speech_ledger = speech_ledger if speech_ledger else SpeechLedger()
         self.thread_id = thread_id
         self.assistant_id = assistant_id
         self.event_handler = None  # Initialize event_handler attribute
+        self.run_id = None  # Run being streamed, so cancel() can stop it server-side
+        self.cancelled = threading.Event()
 
     def set_event_handler(self, event_handler):
         self.event_handler = event_handler
@@ -54,29 +68,61 @@ class AssistantManager:
             print(f"Failed to create a thread: {e}")
             return None
 
+    def cancel(self):
+        """Stops consuming the current stream and cancels its run on the server."""
+        self.cancelled.set()
+        if self.thread_id and self.run_id:
+            # Cancel in the background so the caller (the barge-in path) is not held up by the request
+            threading.Thread(target=self._cancel_run, args=(self.thread_id, self.run_id), daemon=True).start()
+
+    def _cancel_run(self, thread_id, run_id):
+        try:
+            self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+            print(f"Cancelled run {run_id}.")
+        except Exception as e:
+            print(f"Failed to cancel run {run_id}: {e}")
+
+    def _speak(self, message_id, sentence, offset):
+        print(f"Queueing sentence for speech: {sentence}")
+        self.speech_ledger.speak(message_id, offset, sentence, self.text_handler)
+
     def handle_streaming_interaction(self, instructions: str):
         if not self.thread_id or not self.assistant_id:
             print("Thread ID or Assistant ID is not set.")
             return
 
+        if self.cancelled.is_set():
+            return
+
         event_handler = self.event_handler if self.event_handler else EventHandler()  # Use set event handler if available
 
+        # Reply text is spoken sentence by sentence as its deltas stream in
+        segmenters = {}  # Message id -> SentenceSegmenter
+
         with self.client.beta.threads.runs.create_and_stream(
             thread_id=self.thread_id,
             assistant_id=self.assistant_id,
             instructions=instructions,
         ) as stream:
             for event in stream:
-                print("Event received:", event)  # Debug print to confirm events are received
-                # Handle the message content for events with a 'data' attribute containing a message
-                if hasattr(event, 'data') and hasattr(event.data, 'content'):
-                    for content_block in event.data.content:
-                        if content_block.type == 'text':
-                            message_text = content_block.text.value
-                            print(f"Playing message: {message_text}")  # Print statement before playing
-                            self.eleven_labs_manager.play_text(message_text)  # Play the text using ElevenLabsManager
-                            print("Message played using ElevenLabsManager.")  # Print statement after playing
-                            break  # Assuming you only want to print and play the first text block
+                if isinstance(event, ThreadRunCreated):
+                    self.run_id = event.data.id
+                    if self.cancelled.is_set():
+                        self.cancel()  # Cancelled before the run existed
+                if self.cancelled.is_set():
+                    print("\nInteraction cancelled.")
+                    break
+                if isinstance(event, ThreadMessageDelta):
+                    if event.data.id not in segmenters:
+                        segmenters[event.data.id] = SentenceSegmenter(partial(self._speak, event.data.id))
+                    segmenter = segmenters[event.data.id]
+                    for content_block in event.data.delta.content or []:
+                        if content_block.type == 'text' and content_block.text and content_block.text.value:
+                            segmenter.feed(content_block.text.value)
+                else:
+                    print("Event received:", event)  # Debug print to confirm events are received
+                if isinstance(event, ThreadMessageCompleted) and event.data.id in segmenters:
+                    segmenters.pop(event.data.id).flush()
                 # Existing event handling logic
                 if isinstance(event, ThreadMessageDelta):
                     event_handler.on_text_delta(event.data.delta, None)
@@ -89,3 +135,181 @@ class AssistantManager:
                     print("\nInteraction failed.")
                     break  # Exit the loop if the interaction fails
                 # Add more event types as needed based on your application's requirements
+
+        # A message whose completion never arrived still has its last sentence to say
+        if not self.cancelled.is_set():
+            for segmenter in segmenters.values():
+                segmenter.flush()
+
+def create_client(api_key=None, max_connections=10, keepalive_expiry=300.0):
+    """Returns an OpenAI client whose HTTPS connections are pooled and kept alive between
+    turns, so only the first request of the process pays for the TLS handshake."""
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                            keepalive_expiry=keepalive_expiry),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    return openai.OpenAI(api_key=api_key, http_client=http_client)
+
+class ThreadProvisioner:
+    """Keeps empty conversation threads created ahead of time, so a new conversation
+    starts its run at once instead of first waiting on a round trip to create one.
+
+    take() hands out a ready thread and creates its replacement in the background.
+    hits and misses count how often one was ready. stop() deletes the threads
+    never handed out, so none are left behind on the server.
+    """
+
+    def __init__(self, client, size=2):
+        self.client = client
+        self.size = size  # Threads to keep ready
+        self.ready = queue.Queue()  # Ids of empty threads
+        self.creating = 0  # Threads being created in the background
+        self.creators = []  # Threads doing that creating
+        self.stopped = False
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Starts filling the pool."""
+        self._replenish()
+        return self
+
+    def take(self):
+        """Returns the id of an empty thread, or None if one could not be created or the pool is stopped."""
+        with self.lock:
+            stopped = self.stopped
+        if stopped:
+            print("Thread pool is stopped, not creating a thread.")
+            return None
+        try:
+            thread_id = self.ready.get_nowait()
+            with self.lock:
+                self.hits += 1
+        except queue.Empty:
+            with self.lock:
+                self.misses += 1
+            thread_id = self._create()  # None ready yet, e.g. right after startup
+        self._replenish()
+        return thread_id
+
+    def stop(self, timeout=5.0):
+        """Stops replenishing and deletes the threads that were never used."""
+        with self.lock:
+            self.stopped = True
+            creators = list(self.creators)
+        for creator in creators:
+            creator.join(timeout)  # Threads they create from now on are deleted straight away
+        while True:
+            try:
+                self._delete(self.ready.get_nowait())
+            except queue.Empty:
+                break
+
+    def _create(self):
+        try:
+            return self.client.beta.threads.create().id
+        except Exception as e:
+            print(f"Failed to create a thread: {e}")
+            return None
+
+    def _delete(self, thread_id):
+        try:
+            self.client.beta.threads.delete(thread_id)
+        except Exception as e:
+            print(f"Failed to delete thread {thread_id}: {e}")
+
+    def _replenish(self):
+        with self.lock:
+            if self.stopped:
+                return
+            missing = self.size - self.ready.qsize() - self.creating
+            self.creating += max(missing, 0)
+            self.creators = [creator for creator in self.creators if creator.is_alive()]
+            for _ in range(missing):
+                creator = threading.Thread(target=self._create_ready, name="thread-provisioner", daemon=True)
+                self.creators.append(creator)
+                creator.start()
+
+    def _create_ready(self):
+        thread_id = self._create()
+        with self.lock:
+            self.creating -= 1
+            stopped = self.stopped
+            if thread_id and not stopped:
+                self.ready.put(thread_id)
+        if thread_id and stopped:
+            self._delete(thread_id)
+
+class AssistantService:
+    """Process-lifetime access to one assistant, shared by every turn and every device.
+
+    Holds the single pooled client and an AssistantManager per session key
+    (e.g. an input device), each keeping its conversation thread for follow-ups
+    within thread_timeout seconds. New conversations get a thread that the
+    provisioner created ahead of time; the owner starts and stops it.
+    """
+
+    def __init__(self, client, eleven_labs_manager, assistant_id, thread_timeout=90, event_handler_factory=None,
+                 speech_ledger=None, threads_ready=2):
+        self.client = client
+        self.eleven_labs_manager = eleven_labs_manager
+        self.assistant_id = assistant_id
+        self.thread_timeout = thread_timeout
+        self.event_handler_factory = event_handler_factory  # Builds each session's AssistantEventHandler
+        self.speech_ledger = speech_ledger if speech_ledger else SpeechLedger()
+        self.provisioner = ThreadProvisioner(client, size=threads_ready)
+        self.managers = {}  # Session key -> AssistantManager
+        self.last_interaction_times = {}  # Session key -> time of its last turn
+        self.active = set()  # Managers whose reply is being streamed
+        self.lock = threading.Lock()
+
+    def warm_up(self):
+        """Opens a connection to the API ahead of the first turn."""
+        try:
+            self.client.beta.assistants.retrieve(self.assistant_id)
+        except Exception as e:
+            print(f"Assistant warm-up failed: {e}")
+
+    def manager(self, session_key):
+        with self.lock:
+            if session_key not in self.managers:
+                manager = AssistantManager(self.client, self.eleven_labs_manager, assistant_id=self.assistant_id,
+                                           speech_ledger=self.speech_ledger)
+                if self.event_handler_factory:
+                    manager.set_event_handler(self.event_handler_factory())
+                self.managers[session_key] = manager
+            return self.managers[session_key]
+
+    def respond(self, session_key, transcription, text_handler=None):
+        """Streams the assistant's reply to a transcription, passing each reply text to text_handler."""
+        manager = self.manager(session_key)
+        manager.text_handler = text_handler if text_handler else self.eleven_labs_manager.play_text
+        manager.cancelled.clear()
+        manager.run_id = None
+        # Follow-ups soon after the last turn continue its thread
+        last_time = self.last_interaction_times.get(session_key)
+        if not manager.thread_id or last_time is None or time.time() - last_time > self.thread_timeout:
+            manager.thread_id = self.provisioner.take()
+            print(f"Starting new thread: {manager.thread_id}")  # Debug print
+        else:
+            print(f"Using existing thread: {manager.thread_id}")  # Debug print
+        self.last_interaction_times[session_key] = time.time()
+
+        instructions = f"Based on the transcription, interact with the user. Transcription: {transcription}"
+        print(f"Sending instructions to assistant: {instructions}")  # Debug print
+        self.active.add(manager)
+        try:
+            manager.handle_streaming_interaction(instructions)
+        finally:
+            self.active.discard(manager)
+            manager.run_id = None
+
+    def cancel(self, session_key=None):
+        """Stops the reply streaming for session_key (barge-in), or every reply when it is None."""
+        with self.lock:
+            manager = self.managers.get(session_key)
+        for active in list(self.active):
+            if session_key is None or active is manager:
+                active.cancel()
@@ -0,0 +1,211 @@
+"""Asyncio variant of AssistantManager, on openai.AsyncOpenAI.
+
+Replies are consumed with async for instead of a blocking loop per turn, so
+one event loop can stream the replies of many device sessions at once, and a
+turn is cancelled by cancelling its task, which also closes the stream and
+cancels the run on the server.
+"""
+import asyncio
+import inspect
+import time
+import httpx
+import openai
+from openai.types.beta.assistant_stream_event import (
+    ThreadRunCreated, ThreadMessageDelta, ThreadMessageCompleted, ThreadRunCompleted, ThreadRunFailed,
+    ThreadRunCancelled, ThreadRunExpired)
+from sentence_segmenter import SentenceSegmenter
+from speech_ledger import SpeechLedger
+
+def create_async_client(api_key=None, max_connections=10, keepalive_expiry=300.0):
+    """Returns an AsyncOpenAI client with pooled keep-alive connections, like create_client()."""
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                            keepalive_expiry=keepalive_expiry),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    return openai.AsyncOpenAI(api_key=api_key, http_client=http_client)
+
+class TextDelta:
+    """A piece of reply text and where it goes in its message's text.
+
+    The last TextDelta of a message has done set and no text, to say the message is complete.
+    """
+
+    def __init__(self, message_id, offset, text, done=False):
+        self.message_id = message_id
+        self.offset = offset
+        self.text = text
+        self.done = done
+
+    def __repr__(self):
+        return f"TextDelta({self.message_id!r}, {self.offset}, {self.text!r}{', done' if self.done else ''})"
+
+class AsyncAssistantManager:
+    def __init__(self, client, thread_id=None, assistant_id=None, speech_ledger=None):
+        self.client = client  # openai.AsyncOpenAI
+        self.thread_id = thread_id
+        self.assistant_id = assistant_id
+        self.speech_ledger = speech_ledger if speech_ledger else SpeechLedger()
+        self.run_id = None  # Run being streamed
+        self.task = None  # Task running reply(), so cancel() can stop it
+        self.cancellations = set()  # Tasks cancelling runs on the server; the loop only holds weak references
+
+    async def create_thread(self):
+        try:
+            thread = await self.client.beta.threads.create()
+            self.thread_id = thread.id
+            return thread.id
+        except Exception as e:
+            print(f"Failed to create a thread: {e}")
+            return None
+
+    async def stream_text(self, instructions):
+        """Starts a run and yields its reply as TextDeltas while it streams.
+
+        Closing the iterator before the run has finished, or cancelling the
+        task consuming it, cancels the run on the server.
+        """
+        if not self.thread_id or not self.assistant_id:
+            print("Thread ID or Assistant ID is not set.")
+            return
+        offsets = {}  # Message id -> length of its text so far
+        finished = False
+        try:
+            async with self.client.beta.threads.runs.create_and_stream(
+                thread_id=self.thread_id,
+                assistant_id=self.assistant_id,
+                instructions=instructions,
+            ) as stream:
+                async for event in stream:
+                    if isinstance(event, ThreadRunCreated):
+                        self.run_id = event.data.id
+                    elif isinstance(event, ThreadMessageDelta):
+                        for content_block in event.data.delta.content or []:
+                            if content_block.type == 'text' and content_block.text and content_block.text.value:
+                                offset = offsets.get(event.data.id, 0)
+                                offsets[event.data.id] = offset + len(content_block.text.value)
+                                yield TextDelta(event.data.id, offset, content_block.text.value)
+                    elif isinstance(event, ThreadMessageCompleted):
+                        yield TextDelta(event.data.id, offsets.get(event.data.id, 0), "", done=True)
+                    elif isinstance(event, (ThreadRunCompleted, ThreadRunFailed, ThreadRunCancelled, ThreadRunExpired)):
+                        finished = True
+                        if not isinstance(event, ThreadRunCompleted):
+                            print(f"\nInteraction ended: {event.event}")
+                        break
+        finally:
+            if not finished and self.run_id:
+                # Don't hold up the cancellation on the request
+                cancellation = asyncio.ensure_future(self._cancel_run(self.thread_id, self.run_id))
+                self.cancellations.add(cancellation)
+                cancellation.add_done_callback(self.cancellations.discard)
+            self.run_id = None
+
+    async def _cancel_run(self, thread_id, run_id):
+        try:
+            await self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+            print(f"Cancelled run {run_id}.")
+        except Exception as e:
+            print(f"Failed to cancel run {run_id}: {e}")
+
+    async def reply(self, instructions, text_handler):
+        """Streams a reply, passing it to text_handler sentence by sentence.
+
+        text_handler may be a plain function or a coroutine function. Each
+        sentence goes through the speech ledger, so it is spoken only once.
+        """
+        self.task = asyncio.current_task()
+        sentences = []
+        segmenters = {}  # Message id -> SentenceSegmenter
+        deltas = self.stream_text(instructions)
+        try:
+            async for delta in deltas:
+                if delta.done:
+                    # The message's last sentence is spoken now rather than when the whole run ends
+                    if delta.message_id in segmenters:
+                        segmenters.pop(delta.message_id).flush()
+                else:
+                    if delta.message_id not in segmenters:
+                        segmenters[delta.message_id] = SentenceSegmenter(
+                            lambda sentence, offset, message_id=delta.message_id: sentences.append((message_id, sentence, offset)))
+                    segmenters[delta.message_id].feed(delta.text)
+                await self._speak(sentences, text_handler)
+            for segmenter in segmenters.values():
+                segmenter.flush()
+            await self._speak(sentences, text_handler)
+        finally:
+            await deltas.aclose()
+            if self.task is asyncio.current_task():
+                self.task = None
+
+    async def _speak(self, sentences, text_handler):
+        parts = []
+        for message_id, sentence, offset in sentences:
+            print(f"Queueing sentence for speech: {sentence}")
+            self.speech_ledger.speak(message_id, offset, sentence, parts.append)
+        sentences.clear()
+        for part in parts:
+            result = text_handler(part)
+            if inspect.isawaitable(result):
+                await result
+
+    def cancel(self):
+        """Cancels the reply being streamed. Must be called on the event loop's thread."""
+        if self.task is not None:
+            self.task.cancel()
+
+class AsyncAssistantService:
+    """AssistantService for an event loop: one AsyncAssistantManager per session key,
+    any number of them streaming at once."""
+
+    def __init__(self, client, assistant_id, thread_timeout=90, speech_ledger=None, provisioner=None):
+        self.client = client
+        self.assistant_id = assistant_id
+        self.thread_timeout = thread_timeout
+        self.speech_ledger = speech_ledger if speech_ledger else SpeechLedger()
+        self.provisioner = provisioner  # ThreadProvisioner handing out threads created ahead of time
+        self.managers = {}  # Session key -> AsyncAssistantManager
+        self.last_interaction_times = {}  # Session key -> time of its last turn
+
+    async def warm_up(self):
+        """Opens a connection to the API ahead of the first turn."""
+        try:
+            await self.client.beta.assistants.retrieve(self.assistant_id)
+        except Exception as e:
+            print(f"Assistant warm-up failed: {e}")
+
+    def manager(self, session_key):
+        if session_key not in self.managers:
+            self.managers[session_key] = AsyncAssistantManager(self.client, assistant_id=self.assistant_id,
+                                                               speech_ledger=self.speech_ledger)
+        return self.managers[session_key]
+
+    async def respond(self, session_key, transcription, text_handler):
+        """Streams the assistant's reply to a transcription, passing each sentence to text_handler."""
+        manager = self.manager(session_key)
+        if manager.task is not None:
+            manager.task.cancel()  # A newer turn of the session replaces a reply still streaming
+        manager.task = asyncio.current_task()  # Cancellable from here on, before the run exists
+        # Follow-ups soon after the last turn continue its thread
+        last_time = self.last_interaction_times.get(session_key)
+        if not manager.thread_id or last_time is None or time.time() - last_time > self.thread_timeout:
+            if self.provisioner:
+                # Instant when a thread is ready; otherwise it creates one, which must not block the loop
+                manager.thread_id = await asyncio.get_running_loop().run_in_executor(None, self.provisioner.take)
+                print(f"Starting new thread: {manager.thread_id}")
+            else:
+                print("Creating new thread...")
+                await manager.create_thread()
+        else:
+            print(f"Using existing thread: {manager.thread_id}")
+        self.last_interaction_times[session_key] = time.time()
+
+        instructions = f"Based on the transcription, interact with the user. Transcription: {transcription}"
+        print(f"Sending instructions to assistant: {instructions}")
+        await manager.reply(instructions, text_handler)
+
+    def cancel(self, session_key=None):
+        """Stops the reply streaming for session_key (barge-in), or every reply when it is None.
+        Must be called on the event loop's thread."""
+        for key, manager in self.managers.items():
+            if session_key is None or key == session_key:
+                manager.cancel()
@@ -1,77 +1,207 @@
-import os
-import sys
-import pyaudio
-import wave
+import struct
 import threading
+import uuid
+import numpy as np
+from capture_bus import shared_bus, SAMPLE_WIDTH
+from vad import EnergyGate
 
-# Context manager to suppress stderr
-class SuppressStderr:
-    def __enter__(self):
-        self.original_stderr = sys.stderr
-        sys.stderr = open(os.devnull, 'w')
+# Size of the canonical PCM WAV header kept in front of the samples
+WAV_HEADER_BYTES = 44
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        sys.stderr.close()
-        sys.stderr = self.original_stderr
+def wav_header(rate, data_bytes=None):
+    """Returns a mono int16 WAV header. Without data_bytes the sizes are left at their
+    maximum, as for audio that is uploaded before its length is known."""
+    if data_bytes is None:
+        data_bytes = 0xFFFFFFFF - 36
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+                       b'RIFF', 36 + data_bytes, b'WAVE',
+                       b'fmt ', 16, 1, 1, rate, rate * SAMPLE_WIDTH, SAMPLE_WIDTH, 8 * SAMPLE_WIDTH,
+                       b'data', data_bytes)
 
-class AudioRecorder:
-    def __init__(self, output_filename="recorded_audio.wav"):
-        self.output_filename = output_filename
-        self.is_recording = False
-        self.frames = []
-        self.thread = None
-        self.pyaudio_instance = None
-        self.stream = None
+class RecordingBuffer:
+    """Growable in-memory recording with room for a WAV header in front of the samples.
+
+    Capacity starts at initial_seconds and doubles as needed up to max_seconds;
+    audio past the cap is dropped. The finished recording is exposed as
+    memoryviews, so no copy is made between the recorder and the upload.
+    """
+
+    def __init__(self, rate, initial_seconds=15, max_seconds=120, start_position=0):
+        self.rate = rate
+        self.start_position = start_position  # Capture position of the first sample
+        self.max_bytes = max_seconds * rate * SAMPLE_WIDTH
+        self.data = bytearray(WAV_HEADER_BYTES + min(initial_seconds * rate * SAMPLE_WIDTH, self.max_bytes))
+        self.length = 0  # Bytes of PCM stored after the header
+        self.is_full = False
+
+    def append(self, chunk):
+        """Copies int16 PCM into the buffer; returns False once the duration cap is reached."""
+        room = self.max_bytes - self.length
+        if len(chunk) > room:
+            chunk = chunk[:room]
+            if not self.is_full:
+                print(f"Recording reached its {self.max_bytes // (self.rate * SAMPLE_WIDTH)} s limit, dropping the rest.")
+            self.is_full = True
+        end = WAV_HEADER_BYTES + self.length + len(chunk)
+        if end > len(self.data):
+            # Double the capacity rather than growing chunk by chunk
+            new_size = min(max(end, 2 * len(self.data)), WAV_HEADER_BYTES + self.max_bytes)
+            self.data.extend(bytes(new_size - len(self.data)))
+        self.data[end - len(chunk):end] = chunk
+        self.length += len(chunk)
+        return not self.is_full
+
+    def trim(self, cut_spans=(), pad_ms=200, threshold_db=12.0):
+        """Cuts spans of capture positions (e.g. spoken keywords) and the silence before and
+        after the speech, in place. Returns the number of samples removed.
+
+        Call once recording has finished and before taking any views.
+        """
+        samples = np.frombuffer(self.data, dtype=np.int16, count=self.length // SAMPLE_WIDTH, offset=WAV_HEADER_BYTES)
+        keep = np.ones(len(samples), dtype=bool)
+        for start, end in cut_spans:
+            keep[max(0, start - self.start_position):max(0, end - self.start_position)] = False
+        # Speech is whatever clears the recording's own quiet frames by threshold_db, keywords aside
+        gate = EnergyGate(self.rate)
+        energies = gate.frame_energies(samples)
+        frame = gate.frame_samples
+        if len(energies):
+            loud = energies > np.percentile(energies, 10) + threshold_db
+            loud &= keep[:len(energies) * frame].reshape(-1, frame).all(axis=1)
+            speech = np.flatnonzero(loud)
+            if len(speech):
+                pad = pad_ms * self.rate // 1000
+                keep[:max(0, speech[0] * frame - pad)] = False
+                keep[(speech[-1] + 1) * frame + pad:] = False
+        kept = samples[keep]
+        removed = len(samples) - len(kept)
+        samples[:len(kept)] = kept
+        self.length = len(kept) * SAMPLE_WIDTH
+        return removed
+
+    def offset_ms(self, position):
+        """Returns how far into the recording a capture position is in milliseconds, or None
+        if it is not inside the recording. Call before trim(), which shifts the audio."""
+        offset_ms = (position - self.start_position) * 1000 // self.rate
+        if 0 < offset_ms < self.length * 1000 // (self.rate * SAMPLE_WIDTH):
+            return offset_ms
+        return None
+
+    @property
+    def duration(self):
+        return self.length / (self.rate * SAMPLE_WIDTH)
+
+    def pcm(self):
+        """Returns a view of the recorded samples. Call once recording has finished."""
+        return memoryview(self.data)[WAV_HEADER_BYTES:WAV_HEADER_BYTES + self.length]
+
+    def wav(self):
+        """Returns the recording as an in-memory mono WAV file. Call once recording has finished."""
+        self.data[:WAV_HEADER_BYTES] = wav_header(self.rate, self.length)
+        return memoryview(self.data)[:WAV_HEADER_BYTES + self.length]
+
+class Recording:
+    """One recording, with a unique ID, its own capture reader, drain thread and buffer.
+
+    Recordings share nothing with each other, so a new one can start while the
+    last is still being trimmed, encoded or uploaded.
+    """
+
+    def __init__(self, recorder, frame_handlers=None):
+        self.recording_id = uuid.uuid4().hex[:12]
+        self.recorder = recorder
+        self.bus = recorder.bus
+        self.frame_handlers = list(frame_handlers) if frame_handlers else []  # Called with each captured chunk
+        # Fix the start point now; the thread only drains from there
+        self.reader = self.bus.open_reader(preroll_samples=recorder.preroll_ms * self.bus.rate // 1000)
+        self.buffer = RecordingBuffer(self.bus.rate, max_seconds=recorder.max_seconds,
+                                      start_position=self.reader.position)
+        self.gate = None  # EnergyGate watching for the end of speech, when endpointing
+        if recorder.end_of_speech_ms:
+            self.gate = EnergyGate(self.bus.rate, hangover_ms=recorder.end_of_speech_ms)
+        self.speech_ms = 0  # Speech heard since the pre-roll, which may hold the wake word
+        self.speech_from = self.bus.position  # Capture position after the pre-roll
+        self.end_reported = False
+        self.stop_position = None
+        self.is_recording = True
+        self.thread = threading.Thread(target=self._record_audio, name=f"recording-{self.recording_id}")
+        self.thread.start()
 
     def _record_audio(self):
         """Internal method to handle the audio recording."""
-        # Suppress ALSA warnings during PyAudio initialization
-        with SuppressStderr():
-            self.pyaudio_instance = pyaudio.PyAudio()
-            self.stream = self.pyaudio_instance.open(format=pyaudio.paInt16,
-                                                     channels=1,
-                                                     rate=16000,
-                                                     input=True,
-                                                     frames_per_buffer=1024)
-        while self.is_recording:
-            data = self.stream.read(1024, exception_on_overflow=False)
-            self.frames.append(data)
-
-        # Stop and close the stream properly
-        self.stream.stop_stream()
-        self.stream.close()
-        self.pyaudio_instance.terminate()
-
-        # Save the recording to a WAV file
-        with wave.open(self.output_filename, 'wb') as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(self.pyaudio_instance.get_sample_size(pyaudio.paInt16))
-            wf.setframerate(16000)
-            wf.writeframes(b''.join(self.frames))
-
-    def start_recording(self):
-        """Starts the audio recording."""
-        if not self.is_recording:
-            self.is_recording = True
-            self.frames = []
-            self.thread = threading.Thread(target=self._record_audio)
-            self.thread.start()
-            print("Recording started...")
-
-    def stop_recording(self):
-        """Stops the audio recording."""
+        on_end_of_speech = self.recorder.on_end_of_speech
+        # Read until the capture position at which stop() was called
+        while self.is_recording or self.reader.position < self.stop_position:
+            limit = None if self.is_recording else self.stop_position - self.reader.position
+            data = self.reader.read(max_samples=limit, timeout=0.1)
+            if data is not None:
+                kept = self.buffer.append(data)
+                if kept:
+                    for handler in self.frame_handlers:
+                        handler(data)
+                if self.is_recording and not self.end_reported and on_end_of_speech is not None:
+                    reason = "maximum length" if not kept else self._check_end_of_speech(data)
+                    if reason:
+                        self.end_reported = True
+                        on_end_of_speech(self, self.reader.position, reason)
+            elif not self.bus.is_running:
+                break
+
+    def _check_end_of_speech(self, data):
+        """Returns why the recording should end after this chunk, or None to carry on."""
+        if self.gate is None:
+            return None
+        loud_before = self.gate.loud_frames
+        speaking = self.gate.is_speech(data)
+        if self.reader.position > self.speech_from:
+            self.speech_ms += (self.gate.loud_frames - loud_before) * self.gate.frame_samples * 1000 // self.bus.rate
+        # The gate's hangover is the silence allowed, so it closing means the user has stopped
+        if self.speech_ms >= self.recorder.min_speech_ms and not speaking:
+            return "end of speech"
+        return None
+
+    def stop(self, position=None):
+        """Stops at a capture position (default: now) once the audio up to it is in the buffer."""
         if self.is_recording:
+            self.stop_position = min(position, self.bus.position) if position is not None else self.bus.position
             self.is_recording = False
             self.thread.join()  # Wait for the recording thread to finish
-            print("Recording stopped.")
+            print(f"Recording {self.recording_id} stopped ({self.buffer.duration:.1f} s).")
+        return self
+
+class AudioRecorder:
+    """Starts recordings from a capture bus, optionally noticing by itself when the user has finished.
+
+    With end_of_speech_ms set, on_end_of_speech(recording, position, reason) is
+    called once min_speech_ms of speech has been followed by that much silence.
+    It is also called when a recording reaches max_seconds. position is the
+    capture position to stop the recording at; stopping is left to the caller.
+    """
+
+    def __init__(self, bus=None, preroll_ms=500, max_seconds=120, end_of_speech_ms=None, min_speech_ms=300,
+                 on_end_of_speech=None):
+        self.bus = bus if bus else shared_bus  # Shared microphone capture, opened once at startup
+        # Audio from before start_recording() to seed each recording with, so speech
+        # that follows the wake word straight away is not lost
+        self.preroll_ms = preroll_ms
+        self.max_seconds = max_seconds  # Longest recording kept; anything after is dropped
+        self.end_of_speech_ms = end_of_speech_ms
+        self.min_speech_ms = min_speech_ms
+        self.on_end_of_speech = on_end_of_speech
+        self.current = None  # Recording in progress, if any
 
-# Global instance to be used outside this script
-recorder = AudioRecorder()
+    @property
+    def is_recording(self):
+        return self.current is not None
 
-def start_recording():
-    """Function to start recording, intended to be called from elsewhere."""
-    recorder.start_recording()
+    def start_recording(self, frame_handlers=None):
+        """Starts a new Recording, passing each captured chunk to frame_handlers as well."""
+        if self.current is None:
+            self.current = Recording(self, frame_handlers)
+            print(f"Recording {self.current.recording_id} started...")
+        return self.current
 
-def stop_recording():
-    """Function to stop recording, intended to be called from elsewhere."""
-    recorder.stop_recording()
+    def stop_recording(self, position=None):
+        """Stops the recording in progress at a capture position (default: now) and returns it."""
+        recording, self.current = self.current, None
+        return recording.stop(position) if recording is not None else None
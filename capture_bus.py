@@ -0,0 +1,226 @@
+import os
+import sys
+import threading
+import pyaudio
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # int16
+
+# Context manager to suppress stderr
+class SuppressStderr:
+    def __enter__(self):
+        self.original_stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        sys.stderr.close()
+        sys.stderr = self.original_stderr
+
+class CaptureReader:
+    """A consumer's cursor into the capture ring buffer.
+
+    Positions are absolute sample counts since the bus started, so every reader
+    (keyword spotter, recorders) can follow the same audio at its own pace.
+    """
+
+    def __init__(self, bus, position):
+        self.bus = bus
+        self.position = position
+        self.overruns = 0  # Times this reader fell a full buffer behind and skipped ahead
+
+    def read(self, max_samples=None, timeout=None):
+        """Returns the next available samples as a zero-copy memoryview.
+
+        Blocks until audio arrives. Returns None on timeout or when the bus stops.
+        The view stays valid until the ring wraps around onto it, so consume it promptly.
+        """
+        if not self.bus.wait_for(self.position + 1, timeout):
+            return None
+        self._catch_up()
+        end = self.bus.position
+        if max_samples is not None:
+            end = min(end, self.position + max_samples)
+        view = self.bus.view(self.position, end)
+        self.position += len(view) // SAMPLE_WIDTH
+        return view
+
+    def read_exact(self, num_samples, timeout=None):
+        """Returns exactly num_samples samples, or None on timeout or when the bus stops.
+
+        Zero-copy unless the requested span straddles the end of the ring.
+        """
+        if not self.bus.wait_for(self.position + num_samples, timeout):
+            return None
+        self._catch_up()
+        end = self.position + num_samples
+        view = self.bus.view(self.position, end)
+        if len(view) < num_samples * SAMPLE_WIDTH:
+            # Wrapped: stitch the two halves together
+            view = memoryview(bytes(view) + bytes(self.bus.view(self.position + len(view) // SAMPLE_WIDTH, end)))
+        self.position = end
+        return view
+
+    def _catch_up(self):
+        oldest = self.bus.position - self.bus.capacity
+        if self.position < oldest:
+            self.overruns += 1
+            self.bus.reader_overruns += 1
+            print(f"Capture reader overrun, skipping {oldest - self.position} samples.")
+            self.position = oldest
+
+class CaptureBus:
+    """Single microphone stream writing 16 kHz int16 frames into a preallocated
+    ring buffer that any number of readers consume.
+
+    The stream runs in PyAudio callback mode, opened once at startup. Each
+    callback's frames also go to the registered consumers, and overflows and
+    underruns reported by PortAudio are counted in metrics() rather than
+    dropped silently.
+    """
+
+    def __init__(self, device=None, rate=SAMPLE_RATE, frames_per_buffer=320, buffer_seconds=30):
+        self.device = device  # PyAudio input device index, None for the default device
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.capacity = int(buffer_seconds * rate)  # Ring size in samples
+        self.buffer = bytearray(self.capacity * SAMPLE_WIDTH)
+        self.buffer_view = memoryview(self.buffer)
+        self.position = 0  # Total samples written since start
+        self.condition = threading.Condition()
+        self.is_running = False
+        self.pyaudio_instance = None
+        self.stream = None
+        self.consumers = []  # Called with each captured frame, on the PortAudio thread
+        # Counters reported by metrics()
+        self.callbacks = 0
+        self.overflows = 0  # Input audio PortAudio had to drop before we got it
+        self.underflows = 0  # Gaps PortAudio filled in the input
+        self.reader_overruns = 0  # Times a reader fell a whole ring behind
+
+    def start(self):
+        """Opens the microphone once; PortAudio delivers frames from then on."""
+        if self.is_running:
+            return
+        self.is_running = True
+        # Suppress ALSA warnings during PyAudio initialization
+        with SuppressStderr():
+            self.pyaudio_instance = pyaudio.PyAudio()
+            try:
+                self.stream = self.pyaudio_instance.open(format=pyaudio.paInt16,
+                                                         channels=1,
+                                                         rate=self.rate,
+                                                         input=True,
+                                                         input_device_index=self.device,
+                                                         frames_per_buffer=self.frames_per_buffer,
+                                                         stream_callback=self._on_audio)
+            except Exception:
+                self.is_running = False
+                self.pyaudio_instance.terminate()
+                raise
+        print("Microphone capture started.")
+
+    def stop(self):
+        if not self.is_running:
+            return
+        self.stream.stop_stream()  # Returns once the last callback has finished
+        self.stream.close()
+        self.pyaudio_instance.terminate()
+        with self.condition:
+            self.is_running = False
+            self.condition.notify_all()
+        print(f"Microphone capture stopped. {self.metrics()}")
+
+    def add_consumer(self, consumer):
+        """Registers consumer(frames) to be called with every captured frame as a memoryview.
+
+        It runs on PortAudio's callback thread, so it must return quickly and
+        copy anything it keeps.
+        """
+        self.consumers = self.consumers + [consumer]  # Swapped whole so the callback never sees it change
+
+    def remove_consumer(self, consumer):
+        self.consumers = [c for c in self.consumers if c is not consumer]
+
+    def metrics(self):
+        """Capture health counters, so dropped audio shows up instead of going unnoticed."""
+        return {
+            'device': self.device,
+            'seconds_captured': self.position / self.rate,
+            'callbacks': self.callbacks,
+            'overflows': self.overflows,
+            'underflows': self.underflows,
+            'reader_overruns': self.reader_overruns,
+        }
+
+    def open_reader(self, preroll_samples=0):
+        """Returns a reader at the live edge of the capture, or preroll_samples
+        behind it so already-captured audio is replayed first."""
+        # Bounded by what the ring still holds, and by a frame of margin against the writer
+        history = min(self.position, self.capacity - self.frames_per_buffer)
+        return CaptureReader(self, self.position - min(preroll_samples, history))
+
+    def wait_for(self, position, timeout=None):
+        """Blocks until the capture has written up to position. False on timeout or stop."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.position >= position or not self.is_running,
+                                           timeout) and self.position >= position
+
+    def view(self, start, end):
+        """Returns a memoryview of samples [start, end), cut short at the end of the ring."""
+        offset = start % self.capacity
+        count = min(end - start, self.capacity - offset)
+        return self.buffer_view[offset * SAMPLE_WIDTH:(offset + count) * SAMPLE_WIDTH]
+
+    def write(self, data):
+        """Appends captured int16 bytes to the ring and wakes the readers."""
+        data = memoryview(data)
+        while len(data):
+            offset = self.position % self.capacity
+            count = min(len(data) // SAMPLE_WIDTH, self.capacity - offset)
+            self.buffer_view[offset * SAMPLE_WIDTH:(offset + count) * SAMPLE_WIDTH] = data[:count * SAMPLE_WIDTH]
+            data = data[count * SAMPLE_WIDTH:]
+            with self.condition:
+                self.position += count
+                self.condition.notify_all()
+
+    def _on_audio(self, in_data, frame_count, time_info, status_flags):
+        """PortAudio callback: stores one buffer of input and hands it to the consumers."""
+        self.callbacks += 1
+        if status_flags & pyaudio.paInputOverflow:
+            self.overflows += 1
+            print(f"Microphone overflow on device {self.device}, audio was dropped ({self.overflows} so far).")
+        if status_flags & pyaudio.paInputUnderflow:
+            self.underflows += 1
+        self.write(in_data)
+        frames = memoryview(in_data)
+        for consumer in self.consumers:
+            try:
+                consumer(frames)
+            except Exception as e:
+                # An exception escaping the callback would stop the stream
+                print(f"Capture consumer failed: {e}")
+        return (None, pyaudio.paContinue)
+
+# Shared bus for the default microphone, started by main_controller
+shared_bus = CaptureBus()
+
+# Buses for explicitly selected input devices, keyed by PyAudio device index
+device_buses = {}
+
+def capture_metrics():
+    """Returns metrics() of every bus that is capturing."""
+    return [bus.metrics() for bus in [shared_bus] + list(device_buses.values()) if bus.is_running]
+
+def stop_buses():
+    """Stops every bus that is capturing, which ends the readers of all of them."""
+    for bus in [shared_bus] + list(device_buses.values()):
+        bus.stop()
+
+def get_bus(device=None):
+    """Returns the one capture bus for an input device, so the spotter and the
+    recorders of a device always share it. None means the default microphone."""
+    if device is None:
+        return shared_bus
+    if device not in device_buses:
+        device_buses[device] = CaptureBus(device=device)
+    return device_buses[device]
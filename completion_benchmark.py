@@ -0,0 +1,65 @@
+"""Benchmark of how soon a finished batch transcript is picked up.
+
+Runs transcripts against the local BatchStandIn, which finishes each one a
+fixed processing time after it is requested, and compares three ways of
+waiting for it: the SDK's fixed-interval transcribe(), TranscriptCompletion's
+adaptive polling, and its webhook receiver. The lag reported is the time from
+the transcript finishing to the caller having it.
+
+Usage:
+    python completion_benchmark.py [--processing-ms 300 1000 2500] [--runs 5]
+"""
+import argparse
+import time
+import assemblyai as aai
+from assemblyai_standin import BatchStandIn
+from transcript_completion import TranscriptCompletion
+
+def sdk_transcribe(audio_url):
+    return aai.Transcriber().transcribe(audio_url)
+
+def measure(transcribe, audio_url, processing_ms, runs):
+    """Returns the lag of each run in seconds."""
+    lags = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        transcript = transcribe(audio_url)
+        if transcript.status != aai.TranscriptStatus.completed:
+            raise RuntimeError(f"transcript failed: {transcript.error}")
+        lags.append(time.perf_counter() - start - processing_ms / 1000)
+    return lags
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ways of waiting for batch transcripts on a local stand-in.")
+    parser.add_argument('--processing-ms', nargs='+', type=int, default=[300, 1000, 2500],
+                        help="Stand-in processing times to test")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--webhook-port', type=int, default=8767)
+    args = parser.parse_args()
+
+    standin = BatchStandIn().start()
+    aai.settings.api_key = "stand-in"
+    aai.settings.base_url = standin.url
+    audio_url = f"{standin.url}/uploads/benchmark"
+    polling = TranscriptCompletion()
+    webhook = TranscriptCompletion(webhook_url=f"http://127.0.0.1:{args.webhook_port}",
+                                   webhook_port=args.webhook_port).start()
+    modes = [
+        (f"SDK ({aai.settings.polling_interval:.0f} s polling)", sdk_transcribe),
+        ("adaptive polling", lambda url: polling.submit(url).result(60)),
+        ("webhook", lambda url: webhook.submit(url).result(60)),
+    ]
+    try:
+        print(f"{'processing':>10}  {'mode':<22} {'mean lag':>9} {'max lag':>8}")
+        for processing_ms in args.processing_ms:
+            standin.processing_ms = processing_ms
+            for name, transcribe in modes:
+                lags = measure(transcribe, audio_url, processing_ms, args.runs)
+                print(f"{processing_ms:>8} ms  {name:<22} {sum(lags) / len(lags) * 1000:>6.0f} ms "
+                      f"{max(lags) * 1000:>5.0f} ms")
+    finally:
+        webhook.stop()
+        standin.stop()
+
+if __name__ == "__main__":
+    main()
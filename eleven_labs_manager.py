@@ -1,8 +1,8 @@
 import requests
 import os
+import subprocess
+import threading
 from pydub import AudioSegment
-# Import the play function from elevenlabs/utils.py
-from elevenlabs.utils import play
 import io
 
 class ElevenLabsManager:
@@ -11,8 +11,16 @@ class ElevenLabsManager:
         self.voice_id = "RXZFrCz94YM9cSj7aieu"
         self.model_id = "eleven_turbo_v2"
         self.url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}/stream"
+        self.playbacks = {}  # Running ffplay process per session key, kept so stop() can cut it off
+        self.playback_lock = threading.Lock()
 
     def play_text(self, text):
+        audio = self.synthesize(text)
+        if audio:
+            self.play_audio(audio)
+
+    def synthesize(self, text):
+        """Converts text to speech and returns the encoded audio, or None on failure."""
         query_params = {
             "optimize_streaming_latency": 0,
             "output_format": "mp3_44100_128"
@@ -37,7 +45,34 @@ class ElevenLabsManager:
         response = requests.post(self.url, params=query_params, json=payload, headers=headers)
 
         if response.status_code == 200:
-            # Directly play the audio content without saving
-            play(response.content)
-        else:
-            print(f"Failed to convert text to speech. Status code: {response.status_code}, Response: {response.text}")
+            return response.content
+        print(f"Failed to convert text to speech. Status code: {response.status_code}, Response: {response.text}")
+        return None
+
+    def play_audio(self, audio, key=None):
+        """Plays audio returned by synthesize(). Returns early if stop() is called for the same key.
+
+        key identifies the session playing, so stopping one device's reply leaves the others playing.
+        """
+        # Directly play the audio content without saving, through ffplay as elevenlabs.utils.play
+        # does, but keeping hold of the process so playback can be interrupted
+        with self.playback_lock:
+            playback = subprocess.Popen(["ffplay", "-autoexit", "-nodisp", "-loglevel", "quiet", "-"],
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL)
+            self.playbacks[key] = playback
+        try:
+            playback.communicate(input=audio)
+        finally:
+            with self.playback_lock:
+                if self.playbacks.get(key) is playback:
+                    del self.playbacks[key]
+
+    def stop(self, key=None):
+        """Cuts off the current playback of a session, if any."""
+        with self.playback_lock:
+            playback = self.playbacks.get(key)
+            if playback is not None and playback.poll() is None:
+                playback.terminate()
+                print(f"Playback stopped for {key}.")
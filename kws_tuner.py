@@ -0,0 +1,118 @@
+"""Per-keyphrase threshold tuner for keywords.kws.
+
+Sweeps a range of thresholds over a labeled corpus (same layout as
+kws_benchmark.py) and writes a kws file where each keyphrase gets, among the
+thresholds whose false accepts per hour stay within the target, the strictest
+one that still finds the most labeled keyphrases. Keyphrases without labels
+in the corpus keep their current threshold.
+
+Each sweep point decodes the corpus once with every keyphrase at that
+threshold, on worker processes that keep one loaded acoustic model and only
+swap the kws search between points.
+
+Usage:
+    python kws_tuner.py CORPUS_DIR [--target-fa 1.0] [--output keywords.tuned.kws]
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import kws_benchmark
+from kws_benchmark import decode_file, init_worker, score
+from word_detector import KWS_PATH, read_kws
+
+# The kws text the worker's active search was built from
+worker_kws_text = None
+
+def format_kws(entries):
+    return ''.join(f"{phrase} /{threshold:.0e}/\n" for phrase, threshold in entries)
+
+def decode_file_with_kws(kws_text, wav_path, hop_ms):
+    """Decodes one file in a worker, swapping in a new kws search only when kws_text changes."""
+    global worker_kws_text
+    decoder = kws_benchmark.worker_decoder
+    if kws_text != worker_kws_text:
+        with tempfile.NamedTemporaryFile('w', suffix='.kws', delete=False) as f:
+            f.write(kws_text)
+        try:
+            decoder.add_kws('tuning', f.name)  # Replaces the previous sweep point's search
+        finally:
+            os.remove(f.name)
+        decoder.activate_search('tuning')
+        worker_kws_text = kws_text
+    return decode_file(decoder, wav_path, hop_ms)
+
+def sweep(wav_paths, phrases, thresholds, workers=None, hop_ms=20, tolerance=0.5):
+    """Returns {threshold: score stats} for every candidate threshold."""
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(KWS_PATH,)) as pool:
+        futures = {}
+        # Submitted point by point so each worker swaps its search as rarely as possible
+        for threshold in thresholds:
+            kws_text = format_kws([(phrase, threshold) for phrase in phrases])
+            futures[threshold] = [pool.submit(decode_file_with_kws, kws_text, path, hop_ms) for path in wav_paths]
+        return {threshold: score([f.result() for f in fs], tolerance) for threshold, fs in futures.items()}
+
+def choose_thresholds(entries, sweep_stats, hours, target_fa):
+    """Picks, per keyphrase, the threshold with the most hits within the false accept budget.
+
+    entries are the current (keyphrase, threshold) pairs. A keyphrase the
+    corpus has no labels for keeps its current threshold, as there is nothing
+    to tune it on. Falls back to the strictest threshold tried when none meets
+    the target.
+    """
+    chosen = []
+    for phrase, current in entries:
+        if not any(stats.get(phrase, {}).get('labels') for stats in sweep_stats.values()):
+            print(f"{phrase}: no labels in the corpus, keeping threshold {current:.0e}")
+            chosen.append((phrase, current))
+            continue
+        best = None
+        for threshold, stats in sorted(sweep_stats.items()):
+            s = stats.get(phrase, {'hits': 0, 'false_accepts': 0})
+            fa_rate = s['false_accepts'] / hours
+            if fa_rate <= target_fa:
+                # Among equal hit counts prefer the stricter (higher) threshold
+                if best is None or s['hits'] >= best[1]:
+                    best = (threshold, s['hits'], fa_rate)
+        if best is None:
+            print(f"{phrase}: no threshold meets {target_fa} FA/h, using the strictest tried.")
+            best = (max(sweep_stats), 0, None)
+        else:
+            print(f"{phrase}: threshold {best[0]:.0e}, {best[1]} hits, {best[2]:.2f} FA/h")
+        chosen.append((phrase, best[0]))
+    return chosen
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune per-keyphrase kws thresholds on a labeled corpus.")
+    parser.add_argument('corpus', help="Directory of 16 kHz mono WAV files with Audacity label .txt files")
+    parser.add_argument('--kws', default=KWS_PATH, help="Keyword list whose keyphrases are tuned")
+    parser.add_argument('--output', default='keywords.tuned.kws')
+    parser.add_argument('--target-fa', type=float, default=1.0, help="Allowed false accepts per hour per keyphrase")
+    parser.add_argument('--min-exponent', type=int, default=-50)
+    parser.add_argument('--max-exponent', type=int, default=-5)
+    parser.add_argument('--step', type=int, default=2, help="Exponent step between sweep points")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--hop-ms', type=int, default=20, choices=(10, 20, 30))
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    args = parser.parse_args()
+
+    wav_paths = sorted(glob.glob(os.path.join(args.corpus, '**', '*.wav'), recursive=True))
+    if not wav_paths:
+        print(f"No WAV files found in {args.corpus}")
+        return
+    entries = read_kws(args.kws)
+    phrases = [phrase for phrase, _ in entries]
+    thresholds = [10.0 ** e for e in range(args.min_exponent, args.max_exponent + 1, args.step)]
+
+    start = time.time()
+    sweep_stats = sweep(wav_paths, phrases, thresholds, args.workers, args.hop_ms, args.tolerance)
+    hours = kws_benchmark.corpus_hours(wav_paths)
+    chosen = choose_thresholds(entries, sweep_stats, hours, args.target_fa)
+    with open(args.output, 'w') as f:
+        f.write(format_kws(chosen))
+    print(f"Swept {len(thresholds)} thresholds in {time.time() - start:.1f} s, wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,164 +1,291 @@
+import asyncio
 import os
+import threading
 import time
-import re
-from word_detector import setup_keyword_detection, set_message_handler
-from audio_recorder import start_recording, stop_recording
+from functools import partial
+from word_detector import setup_keyword_detection, set_message_handler, join_spotters
+from audio_recorder import AudioRecorder, wav_header
+from capture_bus import get_bus, capture_metrics, stop_buses
 from assemblyai_transcriber import AssemblyAITranscriber
-from assistant_manager import AssistantManager
+from assistant_manager import AssistantService, create_client
+from async_assistant_manager import AsyncAssistantService, create_async_client
 from eleven_labs_manager import ElevenLabsManager
 from vision_module import VisionModule
-import openai
+from turn_orchestrator import TurnOrchestrator
+from hedged_transcription import HedgedTranscriber
+from speech_ledger import SpeechLedger
 from openai import AssistantEventHandler
 
-# Initialize OpenAI client
-openai.api_key = os.getenv("OPENAI_API_KEY")
-openai_client = openai # This line initializes openai_client with the openai library itself
+# One OpenAI client for the whole process, its connections kept alive between turns
+openai_client = create_client(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Initialize modules with provided API keys
-assemblyai_transcriber = AssemblyAITranscriber(api_key=os.getenv("ASSEMBLYAI_API_KEY"))
+# ASSEMBLYAI_REALTIME_URL can point realtime sessions at a local stand-in (see assemblyai_standin.py)
+# UPLOAD_ENCODING ("flac" or "opus") compresses recordings while they are captured, for slow uplinks
+# TRANSCRIPT_WEBHOOK_URL is a public URL forwarded to TRANSCRIPT_WEBHOOK_PORT, to hear of finished transcripts at once
+assemblyai_transcriber = AssemblyAITranscriber(api_key=os.getenv("ASSEMBLYAI_API_KEY"),
+                                               realtime_url=os.getenv("ASSEMBLYAI_REALTIME_URL"),
+                                               upload_encoding=os.getenv("UPLOAD_ENCODING"),
+                                               webhook_url=os.getenv("TRANSCRIPT_WEBHOOK_URL"),
+                                               webhook_port=int(os.getenv("TRANSCRIPT_WEBHOOK_PORT", "8000")))
 # Adjusted to use the hardcoded Assistant ID
 eleven_labs_manager = ElevenLabsManager(api_key=os.getenv("ELEVENLABS_API_KEY"))
 vision_module = VisionModule(openai_api_key=os.getenv("OPENAI_API_KEY"))
+# Every path that speaks a reply goes through this, so each message is spoken once
+speech_ledger = SpeechLedger()
+assistant_service = AssistantService(openai_client, eleven_labs_manager, assistant_id="asst_3D8tACoidstqhbw5JE2Et2st",
+                                     event_handler_factory=lambda: CustomAssistantEventHandler(eleven_labs_manager),
+                                     speech_ledger=speech_ledger)
 
-# State variables
-is_recording = False
-picture_mode = False
-last_thread_id = None
-last_interaction_time = None
-
-# Global variable to hold the concatenated text
-concatenated_text = ""
-
-# Global set to track processed message IDs
-processed_messages = set()
-
-def handle_detected_words(words):
-    global is_recording, picture_mode, last_thread_id, last_interaction_time
-    detected_phrase = ' '.join(words).lower().strip()
-    print(f"Detected phrase: {detected_phrase}")
-
-    if "computer" in detected_phrase and not is_recording:
-        start_recording()
-        is_recording = True
-        print("Recording started...")
-    elif "snapshot" in detected_phrase and is_recording:
-        picture_mode = True
+# Stream audio to AssemblyAI's realtime API while recording instead of uploading the recording afterwards
+streaming_transcription = os.getenv("STREAMING_TRANSCRIPTION") == "1"
+
+# Input devices to listen on, as PyAudio device indexes (e.g. "2,5"); the default microphone if unset
+input_devices = [int(d) for d in os.getenv("INPUT_DEVICES", "").split(",") if d.strip()] or [None]
+
+# END_OF_SPEECH_MS ends a recording after that much silence, so saying "reply" becomes optional
+end_of_speech_ms = int(os.getenv("END_OF_SPEECH_MS", "0")) or None
+# Recordings stop by themselves at this length
+max_recording_seconds = int(os.getenv("MAX_RECORDING_SECONDS", "60"))
+# Cut the spoken keywords and the silence around the speech out of recordings before upload
+trim_recordings = os.getenv("TRIM_RECORDINGS", "1") == "1"
+# Upload recordings to the batch API while they are captured, so only the transcript request is left at the end
+upload_while_recording = os.getenv("UPLOAD_WHILE_RECORDING") == "1"
+# Seconds the cloud gets per transcript before the local pocketsphinx transcript is used instead
+transcription_deadline = float(os.getenv("TRANSCRIPTION_DEADLINE", "8"))
+# Set LOCAL_TRANSCRIPTION=0 to skip the local decode, e.g. on machines short of CPU
+local_transcription = os.getenv("LOCAL_TRANSCRIPTION", "1") == "1"
+# KEYWORD_GATE=1 only runs the keyword decoder while someone is talking, for low idle CPU on small machines
+keyword_gate = os.getenv("KEYWORD_GATE") == "1"
+
+# Created by initialize(), as its worker process must not start when this module is imported
+hedged_transcriber = None
+
+# ASYNC_ASSISTANT=1 streams replies on one asyncio event loop (see async_assistant_manager.py)
+async_assistant = os.getenv("ASYNC_ASSISTANT") == "1"
+# The loop and its service, created by initialize() when async_assistant is set
+assistant_loop = None
+async_assistant_service = None
+
+class EndOfSpeech:
+    """Record-stage event from a recorder that heard the user stop talking, or ran out of length."""
+
+    def __init__(self, device, recording_id, position, reason):
+        self.device = device
+        self.recording_id = recording_id  # Recording it is about
+        self.position = position  # Capture position to stop the recording at
+        self.reason = reason
+
+class DeviceSession:
+    """Conversation state for one input device, so headsets served by the same process don't interfere.
+
+    Each session has a turn pipeline of its own, so one device's slow
+    transcription or reply never holds up another's.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.orchestrator = create_pipeline(device)
+        self.recorder = AudioRecorder(bus=get_bus(device), max_seconds=max_recording_seconds,
+                                      end_of_speech_ms=end_of_speech_ms, on_end_of_speech=self.end_of_speech)
+        self.picture_mode = False
+        self.stream = None  # StreamingTranscription fed by the current recording, in streaming mode
+        self.encoder = None  # UploadEncoder compressing the current recording, if uploads are compressed
+        self.upload = None  # ChunkedUpload of the current recording, when uploading while recording
+        self.keyword_spans = []  # Capture positions of the keywords said during the current recording
+
+    def end_of_speech(self, recording, position, reason):
+        # Called on the recording's thread; the record stage does the stopping
+        self.orchestrator.submit(EndOfSpeech(self.device, recording.recording_id, position, reason))
+
+# Per-device sessions, keyed by device index
+sessions = {}
+
+# Whether saying "computer" over a reply starts a new recording right away ("stop" never does)
+barge_in_starts_recording = True
+
+def get_session(device):
+    if device not in sessions:
+        sessions[device] = DeviceSession(device)
+    return sessions[device]
+
+def submit_event(event):
+    """Routes a detector event to its device's pipeline. Never blocks the spotter."""
+    get_session(event.device).orchestrator.submit(event)
+
+def handle_detected_words(event, emit):
+    """Record stage: drives each device's recording state machine from detector and recorder events."""
+    session = get_session(event.device)
+    if isinstance(event, EndOfSpeech):
+        # Ignored if "reply" got there first
+        current = session.recorder.current
+        if current is not None and current.recording_id == event.recording_id:
+            print(f"Recording stopped on {event.reason}. Processing...")
+            finish_recording(session, emit, event.position)
+        return
+
+    detected_phrase = event.keyphrase.lower().strip()
+    print(f"Detected phrase: {detected_phrase} on device {event.device} "
+          f"(detection latency {event.latency * 1000:.0f} ms)")
+
+    if ("stop" in detected_phrase or "computer" in detected_phrase) and session.orchestrator.is_busy():
+        # Barge-in: drop the reply in progress (the assistant run, pending TTS, playback)
+        print("Barge-in, interrupting the current reply...")
+        session.orchestrator.interrupt()
+        if "stop" in detected_phrase or not barge_in_starts_recording:
+            return
+
+    if "computer" in detected_phrase and not session.recorder.is_recording:
+        frame_handlers = []
+        if streaming_transcription:
+            session.stream = assemblyai_transcriber.start_streaming(session.recorder.bus.rate)
+            frame_handlers.append(session.stream.feed)
+        rate = session.recorder.bus.rate
+        if upload_while_recording:
+            session.upload = assemblyai_transcriber.start_upload()
+        # With an upload open, compressed output goes straight into it. Without one, a recording
+        # that gets trimmed is compressed once after trimming instead of while it is captured
+        if session.upload is not None or not trim_recordings:
+            session.encoder = assemblyai_transcriber.start_encoding(rate, sink=session.upload.feed if session.upload else None)
+        if session.encoder is not None:
+            frame_handlers.append(session.encoder.feed)
+        elif session.upload is not None:
+            session.upload.feed(wav_header(rate))
+            frame_handlers.append(session.upload.feed)
+        session.recorder.start_recording(frame_handlers=frame_handlers)
+        # The wake word usually ends inside the recording's pre-roll
+        session.keyword_spans = [(event.start_sample, event.end_sample)]
+    elif "snapshot" in detected_phrase and session.recorder.is_recording:
+        session.picture_mode = True
+        session.keyword_spans.append((event.start_sample, event.end_sample))
         print("Picture mode activated...")
-    elif "reply" in detected_phrase and is_recording:
-        stop_recording()
-        is_recording = False
+    elif "reply" in detected_phrase and session.recorder.is_recording:
+        session.keyword_spans.append((event.start_sample, event.end_sample))
         print("Recording stopped. Processing...")
-        process_recording()
+        finish_recording(session, emit)
 
-def process_recording():
-    global picture_mode, last_thread_id, last_interaction_time
-    transcription = assemblyai_transcriber.transcribe_audio_file("recorded_audio.wav")
-    print(f"Transcription result: '{transcription}'")
+def finish_recording(session, emit, position=None):
+    """Stops the session's recording and passes the turn on to be transcribed."""
+    recording = session.recorder.stop_recording(position)
+    buffer = recording.buffer
+    # The upload already holds the keywords, so the transcript request skips them instead:
+    # the wake word at the start, and "reply" at the end unless the recording stopped by itself
+    # Each bound is only sent when it falls inside the recording
+    start_ms = buffer.offset_ms(session.keyword_spans[0][1])
+    end_ms = None
+    if position is None and len(session.keyword_spans) > 1:
+        end_ms = buffer.offset_ms(session.keyword_spans[-1][0])
+    if start_ms is not None and end_ms is not None and end_ms <= start_ms:
+        end_ms = None
+    trimmed = 0
+    if trim_recordings:
+        trimmed = buffer.trim(session.keyword_spans)
+        print(f"Trimmed {trimmed * 1000 // buffer.rate} ms of keywords and silence from recording "
+              f"{recording.recording_id}, {buffer.duration:.1f} s left.")
+    # Snapshot the turn's state so the next recording can start right away
+    emit({'session': session, 'recording_id': recording.recording_id, 'audio': buffer.wav(), 'pcm': buffer.pcm(),
+          'rate': buffer.rate, 'stream': session.stream, 'encoder': session.encoder,
+          'upload': session.upload, 'start_ms': start_ms, 'end_ms': end_ms, 'picture_mode': session.picture_mode})
+    session.picture_mode = False
+    session.stream = None
+    session.encoder = None
+    session.upload = None
 
-    if picture_mode:
+def transcribe_in_cloud(turn):
+    """Gets the turn's transcript from AssemblyAI by the quickest route available, or None."""
+    transcription = None
+    if turn['stream'] is not None:
+        # Most of the transcript already arrived while recording
+        transcription = turn['stream'].finish()
+    audio = turn['audio']
+    if turn['upload'] is not None:
+        if turn['encoder'] is not None:
+            turn['encoder'].finish()  # Flushes the last of the compressed audio into the upload
+        if transcription is None:
+            upload_url = turn['upload'].finish()
+            if upload_url is not None:
+                transcription = assemblyai_transcriber.transcribe_uploaded(upload_url, turn['start_ms'], turn['end_ms'])
+        else:
+            turn['upload'].cancel()
+    elif turn['encoder'] is not None:
+        # Flushed even when streaming succeeded, so the ffmpeg process exits
+        audio = turn['encoder'].finish() or audio
+    elif transcription is None:
+        # Trimmed recordings are only compressed now, in one pass (None without UPLOAD_ENCODING)
+        audio = assemblyai_transcriber.encode(turn['pcm'], turn['rate']) or audio
+    if transcription is None:
+        transcription = assemblyai_transcriber.transcribe_audio(audio)
+    return transcription
+
+def process_recording(turn, emit):
+    """Transcribe stage: turns a finished recording into text for the assistant."""
+    # The local decode takes over if AssemblyAI is down or too slow
+    result = hedged_transcriber.transcribe(lambda: transcribe_in_cloud(turn), turn['pcm'])
+    transcription = result.text
+    print(f"Transcription of recording {turn['recording_id']}: '{transcription}' ({result})")
+    if transcription is None:
+        print("No transcript from the cloud or the local decoder, dropping the turn.")
+        return
+
+    if turn['picture_mode']:
         vision_module.capture_image_async()
         description = vision_module.describe_captured_image(transcription=transcription)
         # Handle the image description through streaming interaction
-        interact_with_assistant(description)
-        picture_mode = False
+        emit({'session': turn['session'], 'text': description})
     else:
         # Handle the transcription through streaming interaction
-        interact_with_assistant(transcription)
+        emit({'session': turn['session'], 'text': transcription})
 
 class CustomAssistantEventHandler(AssistantEventHandler):
+    """Echoes the reply as it streams in. Speaking it is left to the speech ledger's path."""
+
     def __init__(self, eleven_labs_manager):
         self.eleven_labs_manager = eleven_labs_manager
-        self.complete_response = ""  # Initialize an empty string to accumulate the response
 
     def on_text_created(self, text) -> None:
-        # This method might still be useful if you receive complete text responses directly.
-        self.complete_response += text  # Append the text to the complete response
-        self.play_response()
+        print("\nassistant > ", end="", flush=True)
 
     def on_text_delta(self, delta, snapshot):
-        # Check if 'delta' contains 'content' changes
-        if 'content' in delta:  # Corrected access
-            # Iterate through each content change
-            for content_change in delta['content']:  # Corrected access
-                # Check if the content change is of type 'text'
-                if content_change['type'] == 'text':
-                    # Extract the text value
-                    text_value = content_change['text']['value']
-                    # Print the text value
-                    print(text_value, end="", flush=True)
-                    # Concatenate the text value to the global variable
-                    global concatenated_text
-                    concatenated_text += text_value
-
-    def play_response(self):
-        # Check if the complete response is not empty
-        if self.complete_response.strip():
-            # Use ElevenLabsManager to play back the text.
-            print(f"Playing message: {self.complete_response}")  # Print statement before playing
-            self.eleven_labs_manager.play_text(self.complete_response)
-            self.complete_response = ""  # Reset the complete response for the next interaction
-
-def process_and_play_text():
-    global concatenated_text
-    # Use regular expression to split the text by '.' or '?' or '\n'
-    sentences = re.split(r'[.?\n]+', concatenated_text)
-    # Remove any empty strings that may result from split and strip whitespace
-    sentences = [sentence.strip() for sentence in sentences if sentence]
-
-    # Play each sentence using ElevenLabsManager
-    for sentence in sentences:
-        print(f"Playing: {sentence}")
-        eleven_labs_manager.play_text(sentence)
-
-    # Reset the concatenated text for the next interaction
-    concatenated_text = ""
-
-def interact_with_assistant(transcription):
-    global last_thread_id, last_interaction_time
-    print("Interacting with assistant...")  # Debug print
+        for content_change in delta.content or []:
+            if content_change.type == 'text' and content_change.text and content_change.text.value:
+                print(content_change.text.value, end="", flush=True)
 
-    # Instantiate CustomAssistantEventHandler
-    custom_event_handler = CustomAssistantEventHandler(eleven_labs_manager)
+def interact_with_assistant(turn, emit):
+    """Assistant stage: streams the reply and emits each text to the TTS stage."""
+    print("Interacting with assistant...")  # Debug print
+    # Each device keeps its own conversation thread
+    if assistant_loop is None:
+        assistant_service.respond(turn['session'].device, turn['text'], text_handler=emit)
+        return
 
-    # Instantiate AssistantManager with required arguments
-    assistant_manager = AssistantManager(openai_client, eleven_labs_manager, assistant_id="asst_3D8tACoidstqhbw5JE2Et2st")
+    async def speak(text):
+        # emit blocks while the TTS queue is full, which must not hold up the loop's other replies
+        await asyncio.get_running_loop().run_in_executor(None, emit, text)
 
-    # Pass the custom event handler to AssistantManager
-    assistant_manager.set_event_handler(custom_event_handler)
+    # Handed to the loop rather than waited on; the stage counts the future as in flight,
+    # and a barge-in cancels it
+    return asyncio.run_coroutine_threadsafe(
+        async_assistant_service.respond(turn['session'].device, turn['text'], speak), assistant_loop)
 
-    # Check if a new thread needs to be created or if an existing one can be used
-    if not last_thread_id or time.time() - last_interaction_time > 90:
-        print("Creating new thread...")  # Debug print
-        last_thread_id = assistant_manager.create_thread()
-        assistant_manager.thread_id = last_thread_id
-    else:
-        print(f"Using existing thread: {last_thread_id}")  # Debug print
+def synthesize_speech(text, emit):
+    """TTS stage: converts reply text to audio."""
+    audio = eleven_labs_manager.synthesize(text)
+    if audio:
+        emit(audio)
 
-    last_interaction_time = time.time()
-    instructions = f"Based on the transcription, interact with the user. Transcription: {transcription}"
-    print(f"Sending instructions to assistant: {instructions}")  # Debug print
-
-    # Assuming handle_streaming_interaction is the method to send instructions
-    # and it's correctly implemented in AssistantManager.
-    assistant_manager.handle_streaming_interaction(instructions)
+def play_speech(audio, emit, device=None):
+    """Playback stage: plays a device's synthesized replies in order."""
+    eleven_labs_manager.play_audio(audio, key=device)
 
 def on_thread_message_completed(data):
-    global processed_messages
     message_id = data.get('id')
-    if message_id in processed_messages:
-        print(f"Message {message_id} already processed.")
-        return
-    processed_messages.add(message_id)
     print("Handling ThreadMessageCompleted event...")
     # Extract and print the message content
-    message_content = data.get('content', [])
-    for content_block in message_content:
-        if content_block['type'] == 'text':
-            message_text = content_block['text']['value']
-            print(f"Received message: {message_text}")
-            # Use ElevenLabsManager to play back the text
-            print(f"Playing message: {message_text}")  # Print statement before playing
-            eleven_labs_manager.play_text(message_text)
+    message_text = "".join(content_block['text']['value'] for content_block in data.get('content', [])
+                           if content_block['type'] == 'text')
+    print(f"Received message: {message_text}")
+    # Only the parts not already spoken from the stream are played
+    speech_ledger.speak(message_id, 0, message_text, eleven_labs_manager.play_text)
 
 # Map event types to handler functions
 event_handlers = {
@@ -175,44 +302,92 @@ def dispatch_event(event_type, data):
         print(f"No handler for event type: {event_type}")
 
 def on_thread_run_step_completed(data):
-    # Extract the message content from the completed run step data
-    message_content = data.get('content', [])
-    # Initialize an empty string to accumulate the response text
-    response_text = ""
-    # Iterate through the content blocks to concatenate the text
-    for content_block in message_content:
-        if content_block['type'] == 'text':
-            response_text += content_block['text']['value']
-    # Check if the response text is not empty
+    # A message creation step carries the id of the message it created
+    message_creation = data.get('step_details', {}).get('message_creation', {})
+    message_id = message_creation.get('message_id', data.get('id'))
+    # Concatenate the text of the content blocks
+    response_text = "".join(content_block['text']['value'] for content_block in data.get('content', [])
+                            if content_block['type'] == 'text')
     if response_text.strip():
-        # Use ElevenLabsManager to play back the text
         print(f"Playing response: {response_text}")  # Print statement before playing
-        eleven_labs_manager.play_text(response_text)
-        print(f"Playing response: {response_text}")
+        speech_ledger.speak(message_id, 0, response_text, eleven_labs_manager.play_text)
+
+def start_async_assistant():
+    """Runs the asyncio assistant on an event loop of its own, shared by every device's replies."""
+    global assistant_loop, async_assistant_service
+    assistant_loop = asyncio.new_event_loop()
+    threading.Thread(target=assistant_loop.run_forever, name="assistant-loop", daemon=True).start()
+    async_assistant_service = AsyncAssistantService(create_async_client(api_key=os.getenv("OPENAI_API_KEY")),
+                                                    assistant_service.assistant_id, speech_ledger=speech_ledger,
+                                                    provisioner=assistant_service.provisioner)
+    asyncio.run_coroutine_threadsafe(async_assistant_service.warm_up(), assistant_loop).result()
+
+def create_pipeline(device):
+    """Builds one device's turn pipeline, run off the keyword-spotting loop."""
+    orchestrator = TurnOrchestrator()
+    orchestrator.add_stage("record", handle_detected_words, maxsize=32)
+    # A barge-in only cuts the reply short; a turn still being transcribed goes on to get its own
+    orchestrator.add_stage("transcribe", process_recording, cancellable=False)
+    orchestrator.add_stage("assistant", interact_with_assistant)
+    orchestrator.add_stage("tts", synthesize_speech)
+    orchestrator.add_stage("playback", partial(play_speech, device=device))
+    # What a barge-in has to cut short besides the queued work, for this device only
+    orchestrator.add_cancel_hook(lambda: eleven_labs_manager.stop(device))
+    if assistant_loop is not None:
+        orchestrator.add_cancel_hook(lambda: assistant_loop.call_soon_threadsafe(async_assistant_service.cancel, device))
+    else:
+        orchestrator.add_cancel_hook(lambda: assistant_service.cancel(device))
+    return orchestrator
+
+# Seconds between health reports
+metrics_interval = 60
+
+def report_metrics():
+    """Prints capture and pipeline health counters every metrics_interval seconds."""
+    while True:
+        time.sleep(metrics_interval)
+        print(f"Capture metrics: {capture_metrics()}")
+        print(f"Duplicate speech suppressed: {speech_ledger.duplicates_suppressed}")
+        provisioner = assistant_service.provisioner
+        print(f"Ready threads: {provisioner.hits} hits, {provisioner.misses} misses")
 
 def initialize():
+    """Starts everything, then spots keywords until capture stops. Does not return before that."""
+    global hedged_transcriber
     print("System initializing...")
-    set_message_handler(handle_detected_words)
-    setup_keyword_detection()
+    hedged_transcriber = HedgedTranscriber(deadline=transcription_deadline, local=local_transcription)
+    # Empty conversation threads made ahead of time, for both kinds of assistant service
+    assistant_service.provisioner.start()
+    if async_assistant:
+        start_async_assistant()
+    else:
+        assistant_service.warm_up()
+    # One microphone stream per device feeds both its keyword spotter and its recorder
+    for device in input_devices:
+        get_bus(device).start()
+        get_session(device).orchestrator.start()
+    # The detector only enqueues; every stage runs on its own worker
+    set_message_handler(submit_event)
+    # Started before keyword detection, which blocks for as long as capture runs
+    threading.Thread(target=report_metrics, name="metrics", daemon=True).start()
+    setup_keyword_detection(devices=input_devices, use_gate=keyword_gate)
+
+def shutdown():
+    """Stops capture and the turn pipelines, then cleans up what would otherwise outlive the process."""
+    # Stopping the buses ends the spotters and the recordings reading them
+    stop_buses()
+    join_spotters()
+    # No turn may reach the transcriber or the assistant once they are shut down
+    for session in sessions.values():
+        session.orchestrator.interrupt()
+        session.orchestrator.stop()
+    # Threads made ahead of time and never used would be left on the server
+    assistant_service.provisioner.stop()
+    if hedged_transcriber is not None:
+        hedged_transcriber.shutdown()
 
 if __name__ == "__main__":
-    initialize()
-    while True:
-        time.sleep(1)
-        # Simulate receiving an event
-        event_received = {
-            'event': 'thread.message.completed',
-            'data': {
-                'id': 'msg_jsoCM86BSagjg4OzAjPKcwhx',
-                'content': [
-                    {
-                        'text': {
-                            'value': 'Hello! How can I assist you today?'
-                        },
-                        'type': 'text'
-                    }
-                ],
-                # Other fields omitted for brevity
-            }
-        }
-        dispatch_event(event_received['event'], event_received['data'])
+    try:
+        initialize()
+    finally:
+        shutdown()
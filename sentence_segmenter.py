@@ -0,0 +1,81 @@
+import re
+
+# End of a sentence: terminal punctuation plus any closing quotes or brackets, then whitespace; or a line break
+BOUNDARY = re.compile(r'[.!?…]+["\'”’)\]]*\s+|\n+')
+
+# Words whose trailing period does not end a sentence
+ABBREVIATIONS = {'mr', 'mrs', 'ms', 'dr', 'prof', 'st', 'vs', 'etc', 'e.g', 'i.e', 'approx'}
+
+# Capitalised words that start a new sentence rather than continue a name after an initial
+SENTENCE_OPENERS = {'the', 'then', 'this', 'that', 'these', 'there', 'it', 'i', 'we', 'you', 'he', 'she', 'they',
+                    'a', 'an', 'and', 'but', 'so', 'if', 'in', 'on', 'my', 'your', 'our', 'let', 'now', 'yes', 'no'}
+
+class SentenceSegmenter:
+    """Splits text that arrives in pieces into sentences, each passed on as soon as it is complete.
+
+    A sentence only counts as complete once the whitespace after its
+    punctuation has arrived, so "3.5" or a reply cut off mid-stream is never
+    split early. flush() passes on whatever is left at the end of a message.
+    Sentences are passed to callback(sentence, offset), offset being where the
+    sentence starts in the message's text.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.buffer = ""
+        self.offset = 0  # Position of the start of buffer in the message's text
+
+    def feed(self, text):
+        self.buffer += text
+        self._split(final=False)
+
+    def flush(self):
+        self._split(final=True)
+        if self.buffer:
+            self._emit(0, len(self.buffer))
+            self.offset += len(self.buffer)
+        self.buffer = ""
+
+    def _split(self, final):
+        """Passes on the complete sentences in buffer. final means no more text is coming."""
+        start = 0
+        for match in BOUNDARY.finditer(self.buffer):
+            words = self.buffer[start:match.start()].split()
+            if match.group().strip() == '.' and words:
+                continues = self._continues(words, self.buffer[match.end():], final)
+                if continues is None:
+                    break  # Up to the next word, which has not arrived yet
+                if continues:
+                    continue  # "Dr. Smith", "J. Doe", "No. 5": not the end
+            self._emit(start, match.end())
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        self.offset += start
+
+    def _continues(self, words, following, final):
+        """Whether the sentence goes on past a period after words, given the text following it.
+
+        None while that depends on the next word and it has not all arrived.
+        """
+        last = words[-1]
+        if last.lower() in ABBREVIATIONS:
+            return True
+        is_initial = len(last) == 1 and last.isupper()
+        if not is_initial and last.lower() != 'no':
+            return False
+        next_words = following.split()
+        if not next_words:
+            return False if final else None
+        if not is_initial:
+            return next_words[0][0].isdigit()  # "No. 5", but not "The answer is no. Sorry"
+        if not final and len(next_words) == 1 and not following[-1].isspace():
+            return None  # The next word may be cut off
+        # "J. Doe", but not "plan B. Then"
+        return next_words[0][0].isupper() and next_words[0].strip('.,;:!?\'"').lower() not in SENTENCE_OPENERS
+
+    def _emit(self, start, end):
+        text = self.buffer[start:end]
+        sentence = text.strip()
+        if sentence:
+            leading = len(text) - len(text.lstrip())
+            self.callback(sentence, self.offset + start + leading)
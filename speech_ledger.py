@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+
+class SpeechLedger:
+    """The one way reply text reaches speech: each span of a message is spoken at most once.
+
+    Spans are keyed by message id and their offset in the message's text, so
+    the same reply arriving sentence by sentence from the stream and again whole
+    from a completion event is only synthesized once. duplicates_suppressed
+    counts the texts that were held back because they had been spoken already.
+    """
+
+    def __init__(self, max_messages=256):
+        self.max_messages = max_messages
+        self.spoken = OrderedDict()  # Message id -> sorted, non-overlapping (start, end) spans
+        self.duplicates_suppressed = 0
+        self.lock = threading.Lock()
+
+    def claim(self, message_id, start, end):
+        """Marks start:end of a message as spoken and returns the parts of it that were not already."""
+        with self.lock:
+            spans = self.spoken.setdefault(message_id, [])
+            self.spoken.move_to_end(message_id)
+            while len(self.spoken) > self.max_messages:
+                self.spoken.popitem(last=False)
+            unspoken, position = [], start
+            for span_start, span_end in spans:
+                if span_end <= position or span_start >= end:
+                    continue
+                if span_start > position:
+                    unspoken.append((position, span_start))
+                position = max(position, span_end)
+            if position < end:
+                unspoken.append((position, end))
+            spans.extend(unspoken)
+            spans.sort()
+            return unspoken
+
+    def speak(self, message_id, offset, text, text_handler):
+        """Passes the not yet spoken parts of text, which starts at offset in the message, to text_handler.
+
+        Returns whether anything was held back as already spoken.
+        """
+        unspoken = self.claim(message_id, offset, offset + len(text))
+        held_back, position = [], 0
+        for start, end in unspoken:
+            held_back.append(text[position:start - offset].strip())
+            position = end - offset
+        held_back = " ".join(part for part in held_back + [text[position:].strip()] if part)
+        for start, end in unspoken:
+            part = text[start - offset:end - offset].strip()
+            if part:
+                text_handler(part)
+        if not held_back:
+            return False
+        with self.lock:
+            self.duplicates_suppressed += 1
+        print(f"Already spoken, not repeating: {held_back}")
+        return True
@@ -0,0 +1,25 @@
+import os
+import shutil
+import sys
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# recorded_audio.wav says "this is it, that reply ... no reply"; the keywords in it, labelled by hand
+RECORDED_AUDIO = os.path.join(REPO_DIR, 'recorded_audio.wav')
+RECORDED_LABELS = [(3.80, 4.36, 'reply'), (6.15, 6.76, 'reply')]
+
+@pytest.fixture
+def labelled_corpus(tmp_path):
+    """A kws_benchmark corpus directory holding recorded_audio.wav and its label track."""
+    shutil.copy(RECORDED_AUDIO, tmp_path / 'recorded_audio.wav')
+    with open(tmp_path / 'recorded_audio.txt', 'w') as f:
+        for start, end, keyphrase in RECORDED_LABELS:
+            f.write(f"{start:.2f}\t{end:.2f}\t{keyphrase}\n")
+    return tmp_path
+
+@pytest.fixture(scope='session')
+def decoder():
+    from word_detector import create_decoder
+    return create_decoder()
@@ -0,0 +1,10 @@
+from audio_recorder import RecordingBuffer
+from capture_bus import SAMPLE_RATE
+
+def test_offset_ms_is_only_given_inside_the_recording():
+    buffer = RecordingBuffer(SAMPLE_RATE, start_position=5 * SAMPLE_RATE)
+    buffer.append(bytes(2 * SAMPLE_RATE * 2))
+    assert buffer.offset_ms(5 * SAMPLE_RATE + SAMPLE_RATE // 2) == 500
+    assert buffer.offset_ms(5 * SAMPLE_RATE) is None  # Nothing to skip
+    assert buffer.offset_ms(4 * SAMPLE_RATE) is None  # Before the recording, e.g. a wake word in the pre-roll
+    assert buffer.offset_ms(8 * SAMPLE_RATE) is None  # Past its end
@@ -0,0 +1,36 @@
+import wave
+from conftest import RECORDED_AUDIO, RECORDED_LABELS
+from capture_bus import CaptureBus, SAMPLE_RATE
+from word_detector import KeywordSpotter
+
+def recorded_pcm():
+    with wave.open(RECORDED_AUDIO, 'rb') as wf:
+        return wf.readframes(wf.getnframes())
+
+def spot(decoder, bus, reader):
+    """Runs a spotter over everything written to the (stopped) bus."""
+    detections = []
+    KeywordSpotter(decoder, detections.append, rate=bus.rate).run(reader)
+    return detections
+
+def assert_at_labels(detections, offset_seconds):
+    for event, (start, end, _) in zip(detections, RECORDED_LABELS):
+        assert abs(event.start_sample - (offset_seconds + start) * SAMPLE_RATE) < 0.1 * SAMPLE_RATE
+    assert len(detections) == len(RECORDED_LABELS)
+
+def test_positions_are_capture_positions(decoder):
+    # Audio captured before the spotter's reader opened still counts towards bus positions
+    bus = CaptureBus()
+    bus.write(bytes(3 * SAMPLE_RATE * 2))
+    reader = bus.open_reader()
+    bus.write(recorded_pcm())
+    assert_at_labels(spot(decoder, bus, reader), 3)
+
+def test_positions_survive_a_reader_overrun(decoder):
+    bus = CaptureBus(buffer_seconds=10)
+    reader = bus.open_reader()
+    # The reader falls more than a ring behind, so it skips ahead to the oldest audio kept
+    bus.write(bytes(12 * SAMPLE_RATE * 2))
+    bus.write(recorded_pcm())
+    assert_at_labels(spot(decoder, bus, reader), 12)
+    assert reader.overruns == 1
@@ -0,0 +1,22 @@
+from kws_benchmark import corpus_hours
+from kws_tuner import choose_thresholds, sweep
+
+def stats(hits, false_accepts, labels=2):
+    return {'reply': {'labels': labels, 'hits': hits, 'misses': labels - hits,
+                      'false_accepts': false_accepts, 'latencies': []}}
+
+def test_prefers_the_strictest_threshold_that_keeps_the_hits():
+    sweep_stats = {1e-40: stats(2, 3), 1e-30: stats(2, 0), 1e-20: stats(2, 0), 1e-10: stats(1, 0)}
+    assert choose_thresholds([('reply', 1e-19)], sweep_stats, hours=1.0, target_fa=1.0) == [('reply', 1e-20)]
+
+def test_keeps_the_threshold_of_unlabelled_keyphrases():
+    sweep_stats = {1e-30: stats(2, 0), 1e-10: stats(2, 0)}
+    chosen = choose_thresholds([('reply', 1e-19), ('computer', 1e-19)], sweep_stats, hours=1.0, target_fa=1.0)
+    assert chosen[1] == ('computer', 1e-19)
+
+def test_sweep_on_recorded_audio_keeps_both_replies(labelled_corpus):
+    wav_paths = [str(labelled_corpus / 'recorded_audio.wav')]
+    thresholds = [1e-40, 1e-30, 1e-20, 1e-10]
+    sweep_stats = sweep(wav_paths, ['reply'], thresholds, workers=1)
+    [(phrase, threshold)] = choose_thresholds([('reply', 1e-19)], sweep_stats, corpus_hours(wav_paths), target_fa=1.0)
+    assert sweep_stats[threshold]['reply']['hits'] == 2
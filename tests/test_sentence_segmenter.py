@@ -0,0 +1,48 @@
+from sentence_segmenter import SentenceSegmenter
+
+def segment(*pieces):
+    """Feeds the pieces one by one and returns the (sentence, offset) pairs passed on, flush included."""
+    sentences = []
+    segmenter = SentenceSegmenter(lambda sentence, offset: sentences.append((sentence, offset)))
+    for piece in pieces:
+        segmenter.feed(piece)
+    segmenter.flush()
+    return sentences
+
+def test_splits_at_sentence_ends_with_offsets():
+    text = "Hello there! How are you? Fine."
+    assert segment(text) == [("Hello there!", 0), ("How are you?", 13), ("Fine.", 26)]
+
+def test_sentences_are_passed_on_as_soon_as_complete():
+    sentences = []
+    segmenter = SentenceSegmenter(lambda sentence, offset: sentences.append(sentence))
+    segmenter.feed("It is 3.")
+    assert sentences == []  # "3.5" could still follow
+    segmenter.feed("5 degrees. Then")
+    assert sentences == ["It is 3.5 degrees."]
+
+def test_abbreviations_and_initials_do_not_end_sentences():
+    assert [s for s, _ in segment("Dr. Smith met J. Doe today. Bye.")] == ["Dr. Smith met J. Doe today.", "Bye."]
+    assert [s for s, _ in segment("Room No. 5 is free. Bye.")] == ["Room No. 5 is free.", "Bye."]
+
+def test_short_words_before_a_period_still_end_sentences():
+    assert [s for s, _ in segment("The answer is no. Sorry.")] == ["The answer is no.", "Sorry."]
+    assert [s for s, _ in segment("No. I can't.")] == ["No.", "I can't."]
+    assert [s for s, _ in segment("I am 5. Next year 6.")] == ["I am 5.", "Next year 6."]
+    assert [s for s, _ in segment("We need plan B. Then we go.")] == ["We need plan B.", "Then we go."]
+
+def test_waits_for_the_word_after_a_possible_initial():
+    sentences = []
+    segmenter = SentenceSegmenter(lambda sentence, offset: sentences.append(sentence))
+    segmenter.feed("Call J. ")
+    assert sentences == []
+    segmenter.feed("Doe now. ")
+    assert sentences == ["Call J. Doe now."]
+
+def test_flush_passes_on_the_rest():
+    assert segment("Almost done", " here") == [("Almost done here", 0)]
+
+def test_streaming_character_by_character_gives_the_same_sentences():
+    for text in ["Dr. Smith met J. Doe today. Bye.", "The answer is no. Sorry.", "We need plan B. Then we go.",
+                 "Room No. 5 is free. It is 3.5 degrees."]:
+        assert segment(*text) == segment(text)
@@ -0,0 +1,51 @@
+from speech_ledger import SpeechLedger
+
+MESSAGE = "Hello there. How can I help? Ask me anything."
+
+def speak_sentences(ledger, spoken):
+    """Speaks MESSAGE sentence by sentence, as the stream delivers it."""
+    for sentence in ("Hello there.", "How can I help?", "Ask me anything."):
+        ledger.speak("msg_1", MESSAGE.index(sentence), sentence, spoken.append)
+
+def test_whole_message_after_its_sentences_is_not_repeated():
+    ledger, spoken = SpeechLedger(), []
+    speak_sentences(ledger, spoken)
+    assert ledger.speak("msg_1", 0, MESSAGE, spoken.append)
+    assert spoken == ["Hello there.", "How can I help?", "Ask me anything."]
+    assert ledger.duplicates_suppressed == 1
+
+def test_sentences_after_their_whole_message_are_not_repeated():
+    ledger, spoken = SpeechLedger(), []
+    assert not ledger.speak("msg_1", 0, MESSAGE, spoken.append)
+    speak_sentences(ledger, spoken)
+    assert spoken == [MESSAGE]
+    assert ledger.duplicates_suppressed == 3
+
+def test_partial_overlap_speaks_only_the_new_part():
+    ledger, spoken = SpeechLedger(), []
+    ledger.speak("msg_1", 0, "Hello there.", spoken.append)
+    assert ledger.speak("msg_1", 0, "Hello there. How can I help?", spoken.append)
+    assert spoken == ["Hello there.", "How can I help?"]
+    assert ledger.duplicates_suppressed == 1
+
+def test_gap_between_spoken_spans_is_filled_in():
+    ledger, spoken = SpeechLedger(), []
+    sentences = [("Hello there.", 0), ("Ask me anything.", MESSAGE.index("Ask"))]
+    for sentence, offset in sentences:
+        ledger.speak("msg_1", offset, sentence, spoken.append)
+    ledger.speak("msg_1", 0, MESSAGE, spoken.append)
+    assert spoken == ["Hello there.", "Ask me anything.", "How can I help?"]
+    assert ledger.duplicates_suppressed == 1
+
+def test_messages_are_tracked_separately():
+    ledger, spoken = SpeechLedger(), []
+    ledger.speak("msg_1", 0, "Hello there.", spoken.append)
+    assert not ledger.speak("msg_2", 0, "Hello there.", spoken.append)
+    assert spoken == ["Hello there.", "Hello there."]
+    assert ledger.duplicates_suppressed == 0
+
+def test_oldest_messages_are_forgotten_past_max_messages():
+    ledger, spoken = SpeechLedger(max_messages=2), []
+    for message_id in ("msg_1", "msg_2", "msg_3"):
+        ledger.speak(message_id, 0, "Hi.", spoken.append)
+    assert list(ledger.spoken) == ["msg_2", "msg_3"]
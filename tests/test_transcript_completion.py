@@ -0,0 +1,55 @@
+import pytest
+import assemblyai as aai
+import transcript_completion
+from assemblyai_standin import BatchStandIn
+from assemblyai_transcriber import AssemblyAITranscriber
+from transcript_completion import TranscriptCompletion
+
+@pytest.fixture
+def standin(monkeypatch):
+    standin = BatchStandIn(processing_ms=300).start()
+    # Restored afterwards, also when the code under test sets them again
+    monkeypatch.setattr(aai.settings, 'api_key', "stand-in")
+    monkeypatch.setattr(aai.settings, 'base_url', standin.url)
+    yield standin
+    standin.stop()
+
+def fail_first_fetches(monkeypatch, count):
+    """Makes the first count transcript fetches fail, as a dropped connection would."""
+    get_transcript = transcript_completion.api.get_transcript
+    calls = []
+
+    def flaky(*args, **kwargs):
+        calls.append(args)
+        if len(calls) <= count:
+            raise ConnectionError("connection reset")
+        return get_transcript(*args, **kwargs)
+    monkeypatch.setattr(transcript_completion.api, 'get_transcript', flaky)
+    return calls
+
+def test_polling_retries_a_failed_fetch(standin, monkeypatch):
+    fail_first_fetches(monkeypatch, 1)
+    transcript = TranscriptCompletion().submit(f"{standin.url}/uploads/test").result(10)
+    assert transcript.text == standin.text
+
+def test_polling_gives_up_after_repeated_failures(standin, monkeypatch):
+    fail_first_fetches(monkeypatch, 3)
+    with pytest.raises(ConnectionError):
+        TranscriptCompletion(fetch_attempts=3).submit(f"{standin.url}/uploads/test").result(10)
+
+def test_webhook_retries_a_failed_fetch(standin, monkeypatch):
+    # Port 0 lets the receiver take any free port, which the webhook URL then points at
+    completion = TranscriptCompletion(webhook_url="http://127.0.0.1", webhook_port=0, webhook_poll_interval=30).start()
+    completion.webhook_url = f"http://127.0.0.1:{completion.server.server_address[1]}"
+    try:
+        fail_first_fetches(monkeypatch, 1)
+        transcript = completion.submit(f"{standin.url}/uploads/test").result(10)
+        assert transcript.text == standin.text
+    finally:
+        completion.stop()
+
+def test_timed_out_transcripts_are_dropped(standin):
+    standin.processing_ms = 5000
+    transcriber = AssemblyAITranscriber(api_key="stand-in")
+    assert transcriber._transcribe(f"{standin.url}/uploads/test", timeout=0.3) is None
+    assert transcriber.completion.pending == {}
@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import Future
+from turn_orchestrator import TurnOrchestrator
+
+def build(record, transcribe, reply, transcribe_cancellable=True):
+    """A three-stage pipeline shaped like main_controller's."""
+    orchestrator = TurnOrchestrator()
+    orchestrator.add_stage("record", record)
+    orchestrator.add_stage("transcribe", transcribe, cancellable=transcribe_cancellable)
+    orchestrator.add_stage("reply", reply)
+    return orchestrator
+
+def test_interrupt_drops_the_queued_turns():
+    release = threading.Event()
+    started = threading.Event()
+    replies = []
+
+    def reply(text, emit):
+        started.set()
+        release.wait(5)
+        replies.append(text)
+
+    orchestrator = build(lambda event, emit: emit(event), lambda event, emit: emit(event), reply)
+    orchestrator.start()
+    orchestrator.submit("first")
+    assert started.wait(5)
+    orchestrator.stages[-1].queue.put((orchestrator.generation, "queued"))
+    orchestrator.interrupt()
+    assert orchestrator.stages[-1].queue.empty()
+    release.set()
+    orchestrator.submit("after")
+    orchestrator.stop()
+    assert replies == ["first", "after"]
+
+def test_results_of_an_interrupted_turn_are_not_passed_on():
+    orchestrator = build(lambda event, emit: None, lambda event, emit: None, lambda event, emit: None)
+    transcribe, reply = orchestrator.stages[1:]
+    orchestrator.interrupt()
+    transcribe.emit("stale", generation=0)  # From work handed off before the interrupt
+    transcribe.emit("fresh", generation=1)
+    assert reply.queue.get_nowait() == (1, "fresh")
+    assert reply.queue.empty()
+
+def test_drain_empties_the_queue():
+    orchestrator = build(lambda event, emit: None, lambda event, emit: None, lambda event, emit: None)
+    stage = orchestrator.stages[1]
+    for i in range(3):
+        stage.queue.put((0, i))
+    stage.drain()
+    assert stage.queue.empty()
+
+def test_cancel_in_flight_cancels_handed_off_work():
+    handed_off = Future()
+    orchestrator = build(lambda event, emit: emit(event), lambda event, emit: handed_off, lambda event, emit: None)
+    orchestrator.start()
+    orchestrator.submit("turn")
+    orchestrator.stop()
+    assert orchestrator.is_busy()  # The future is still in flight
+    orchestrator.stages[1].cancel_in_flight()
+    assert handed_off.cancelled()
+    assert not orchestrator.is_busy()
+
+def test_work_in_a_stage_that_is_not_cancellable_survives_interrupts():
+    release = threading.Event()
+    started = threading.Event()
+    replies = []
+
+    def transcribe(event, emit):
+        started.set()
+        release.wait(5)
+        emit(event)
+
+    orchestrator = build(lambda event, emit: emit(event), transcribe, lambda text, emit: replies.append(text),
+                         transcribe_cancellable=False)
+    orchestrator.start()
+    orchestrator.submit("turn")
+    assert started.wait(5)
+    assert not orchestrator.is_busy()  # Nothing to barge in on while only transcribing
+    orchestrator.interrupt()
+    release.set()
+    orchestrator.stop()
+    assert replies == ["turn"]
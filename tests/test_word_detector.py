@@ -0,0 +1,63 @@
+import wave
+import numpy as np
+from conftest import RECORDED_AUDIO
+from kws_benchmark import decode_file, score
+from capture_bus import SAMPLE_RATE, SAMPLE_WIDTH
+from vad import SpeechGate
+from word_detector import KeywordSpotter, create_decoder
+
+def test_keyphrases_are_reported_without_padding(decoder):
+    # The decoder's segments carry a trailing space ('reply ')
+    result = decode_file(decoder, RECORDED_AUDIO)
+    assert [keyphrase for keyphrase, _, _, _ in result['detections']] == ['reply', 'reply']
+
+def test_detections_score_against_labels(decoder, labelled_corpus):
+    result = decode_file(decoder, str(labelled_corpus / 'recorded_audio.wav'))
+    stats = score([result])
+    assert list(stats) == ['reply']
+    assert (stats['reply']['hits'], stats['reply']['misses'], stats['reply']['false_accepts']) == (2, 0, 0)
+
+def test_gated_decode_keeps_both_hits(labelled_corpus):
+    # The first "reply" in recorded_audio.wav starts softly; an energy gate opened too late for it
+    result = decode_file(create_decoder(), str(labelled_corpus / 'recorded_audio.wav'), gate=True)
+    stats = score([result])
+    assert (stats['reply']['hits'], stats['reply']['false_accepts']) == (2, 0)
+
+def test_gate_stays_shut_on_room_noise():
+    rng = np.random.default_rng(0)
+    t = np.arange(10 * SAMPLE_RATE) / SAMPLE_RATE
+    noise = (rng.normal(0, 30, len(t)) + 20 * np.sin(2 * np.pi * 50 * t)).astype(np.int16).tobytes()
+    gate = SpeechGate(rate=SAMPLE_RATE)
+    hop_bytes = gate.frame_bytes
+    opened = sum(gate.is_speech(noise[i:i + hop_bytes]) for i in range(0, len(noise) - hop_bytes + 1, hop_bytes))
+    assert opened < len(noise) // hop_bytes // 10
+
+class FailingKwsDecoder:
+    """A real decoder whose add_kws fails, as pocketsphinx does on a kws file it cannot build."""
+
+    def __init__(self, decoder):
+        self.decoder = decoder
+
+    def add_kws(self, name, kws_path):
+        raise RuntimeError("Failed to create kws search")
+
+    def __getattr__(self, name):
+        return getattr(self.decoder, name)
+
+def test_failed_reload_keeps_the_current_keywords(tmp_path):
+    kws_path = tmp_path / 'keywords.kws'
+    kws_path.write_text("reply /1e-19/\n")
+    decoder = create_decoder(str(kws_path))
+    detections = []
+    spotter = KeywordSpotter(FailingKwsDecoder(decoder), detections.append, kws_path=str(kws_path))
+    search = decoder.current_search()
+    kws_path.write_text("reply /1e-20/\n")
+    assert spotter.reload_keywords() is False
+    assert decoder.current_search() == search
+    with wave.open(RECORDED_AUDIO, 'rb') as wf:
+        pcm = memoryview(wf.readframes(wf.getnframes()))
+    hop_bytes = spotter.hop_samples * SAMPLE_WIDTH
+    for offset in range(0, len(pcm) - hop_bytes + 1, hop_bytes):
+        spotter.process(pcm[offset:offset + hop_bytes])
+    spotter.finish()
+    assert [event.keyphrase for event in detections] == ['reply', 'reply']
@@ -0,0 +1,143 @@
+"""Completion layer for batch transcripts: resolves a Future as soon as a transcript is done.
+
+The SDK's transcribe() checks on a transcript every aai.settings.polling_interval
+(3 s), which is most of the wait for a short clip. TranscriptCompletion polls
+tightly at first and backs off, and can also listen for AssemblyAI's webhook
+on a local HTTP receiver. Whichever hears first resolves the future.
+"""
+import json
+import secrets
+import threading
+import time
+from concurrent.futures import Future, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import assemblyai as aai
+from assemblyai import api, types
+
+# Header AssemblyAI is asked to send with webhook calls, so forged ones are ignored
+WEBHOOK_AUTH_HEADER = 'X-Heady-Webhook-Token'
+
+class TranscriptCompletion:
+    """Submits transcripts and resolves their futures with the finished TranscriptResponse.
+
+    webhook_url is the public URL AssemblyAI calls, forwarded to webhook_port
+    here. While the webhook is up, polling only runs every webhook_poll_interval
+    as a safety net for lost calls. A transcript that cannot be fetched
+    fetch_attempts times in a row fails.
+    """
+
+    def __init__(self, first_interval=0.1, backoff=1.5, max_interval=2.0,
+                 webhook_url=None, webhook_port=8000, webhook_poll_interval=5.0, fetch_attempts=3):
+        self.first_interval = first_interval
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.webhook_url = webhook_url
+        self.webhook_port = webhook_port
+        self.webhook_poll_interval = webhook_poll_interval
+        self.fetch_attempts = fetch_attempts
+        self.webhook_token = secrets.token_urlsafe(16)
+        self.server = None
+        self.pending = {}  # Transcript id -> Future
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Starts the webhook receiver, if a webhook URL is configured."""
+        if self.webhook_url and self.server is None:
+            completion = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_POST(self):
+                    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    self.send_response(200)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    if self.headers.get(WEBHOOK_AUTH_HEADER) == completion.webhook_token:
+                        completion._on_webhook(json.loads(body))
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer(("0.0.0.0", self.webhook_port), Handler)
+            threading.Thread(target=self.server.serve_forever, name="transcript-webhook", daemon=True).start()
+            print(f"Transcript webhook receiver listening on port {self.server.server_address[1]}.")
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+    def submit(self, audio_url, config=None):
+        """Requests a transcript of audio_url and returns a Future of its final TranscriptResponse."""
+        config = config if config else aai.TranscriptionConfig()
+        if self.server is not None:
+            config.set_webhook(self.webhook_url, WEBHOOK_AUTH_HEADER, self.webhook_token)
+        client = aai.Client.get_default()
+        future = Future()
+        try:
+            response = api.create_transcript(client.http_client, types.TranscriptRequest(
+                audio_url=audio_url, **config.raw.dict(exclude_none=True)))
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        with self.lock:
+            self.pending[response.id] = future
+        threading.Thread(target=self._poll, args=(client, response.id, future), daemon=True).start()
+        return future
+
+    def cancel(self, future):
+        """Stops waiting on a submitted transcript, e.g. once its caller has timed out."""
+        with self.lock:
+            transcript_ids = [transcript_id for transcript_id, pending in self.pending.items() if pending is future]
+            for transcript_id in transcript_ids:
+                del self.pending[transcript_id]
+        if transcript_ids:
+            future.cancel()  # Also ends its polling thread
+
+    def _poll(self, client, transcript_id, future):
+        interval = self.webhook_poll_interval if self.server is not None else self.first_interval
+        failures = 0
+        # Waiting on a future that is resolved or cancelled elsewhere returns early, ending the loop
+        while not wait([future], timeout=interval).done:
+            try:
+                response = api.get_transcript(client.http_client, transcript_id)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures >= self.fetch_attempts:
+                    self._resolve(transcript_id, exception=e)
+                    return
+                print(f"Failed to fetch transcript {transcript_id}, retrying: {e}")
+                interval = min(self.first_interval * self.backoff ** failures, self.max_interval)
+                continue
+            if response.status in (types.TranscriptStatus.completed, types.TranscriptStatus.error):
+                self._resolve(transcript_id, response)
+            elif self.server is None:
+                interval = min(interval * self.backoff, self.max_interval)
+            else:
+                interval = self.webhook_poll_interval
+
+    def _on_webhook(self, notification):
+        transcript_id = notification.get('transcript_id')
+        if transcript_id not in self.pending:
+            return  # Already resolved by polling, or not ours
+        for attempt in range(self.fetch_attempts):
+            try:
+                response = api.get_transcript(aai.Client.get_default().http_client, transcript_id)
+                break
+            except Exception as e:
+                print(f"Failed to fetch transcript {transcript_id} after its webhook: {e}")
+                time.sleep(min(self.first_interval * self.backoff ** attempt, self.max_interval))
+        else:
+            return  # Polling is still running and will try again
+        self._resolve(transcript_id, response)
+
+    def _resolve(self, transcript_id, response=None, exception=None):
+        with self.lock:
+            future = self.pending.pop(transcript_id, None)
+        if future is None:
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(response)
@@ -0,0 +1,170 @@
+import queue
+import threading
+from concurrent.futures import Future
+from functools import partial
+
+# Sentinel used to shut a stage's worker down
+_STOP = object()
+
+class Stage:
+    """A single pipeline stage: one worker thread draining a bounded input queue.
+
+    Items are queued with the orchestrator generation they belong to; in a
+    cancellable stage anything from before the latest interrupt() is dropped
+    instead of handled or passed on.
+
+    A handler may hand its work off (e.g. to an event loop) and return its
+    concurrent.futures.Future instead of blocking the worker. The work counts
+    as in flight until the future is done, and interrupt() cancels it.
+    """
+
+    def __init__(self, orchestrator, name, handler, maxsize=4, cancellable=True):
+        self.orchestrator = orchestrator
+        self.cancellable = cancellable
+        self.name = name
+        self.handler = handler  # Called as handler(item, emit) for every queued item
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.next_stage = None
+        self.thread = None
+        self.is_busy = False
+        self.generation = 0  # Generation of the item being handled
+        self.in_flight = set()  # Futures of work handed off by the handler
+
+    def emit(self, item, generation=None):
+        """Passes a result on to the next stage, blocking while its queue is full.
+
+        generation is that of the item it came from (default: the one in hand);
+        results of an interrupted turn are dropped. A stage that is not
+        cancellable always passes its results on under the current generation.
+        """
+        if not self.cancellable:
+            generation = self.orchestrator.generation
+        elif generation is None:
+            generation = self.generation
+        if self.next_stage is not None and generation == self.orchestrator.generation:
+            self.next_stage.queue.put((generation, item))
+
+    def drain(self):
+        """Discards everything waiting in this stage's queue."""
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def cancel_in_flight(self):
+        """Cancels the work handed off by the handler."""
+        for future in list(self.in_flight):
+            future.cancel()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name=f"stage-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return  # Never started
+        self.queue.put(_STOP)
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            entry = self.queue.get()
+            if entry is _STOP:
+                break
+            generation, item = entry
+            if not self.cancellable:
+                generation = self.orchestrator.generation  # e.g. detector events outlive interrupts
+            elif generation != self.orchestrator.generation:
+                continue  # Interrupted while queued
+            self.generation = generation
+            self.is_busy = True
+            try:
+                # Bound to the item's generation, so work handed off can emit after the worker moved on
+                result = self.handler(item, partial(self.emit, generation=generation))
+                if isinstance(result, Future):
+                    self.in_flight.add(result)
+                    result.add_done_callback(self._finished)
+            except Exception as e:
+                # A failing turn must not take the whole stage down with it
+                print(f"Stage '{self.name}' failed: {e}")
+            finally:
+                self.is_busy = False
+
+    def _finished(self, future):
+        self.in_flight.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Stage '{self.name}' failed: {future.exception()}")
+
+class TurnOrchestrator:
+    """Runs the turn pipeline (record -> transcribe -> assistant -> TTS -> playback)
+    on dedicated workers so the keyword spotter is never blocked by a turn.
+
+    One orchestrator serves one session (main_controller builds one per
+    device), so is_busy() and interrupt() only concern that session's turns,
+    and its cancel hooks should only abort that session's work.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.generation = 0  # Bumped by interrupt() to invalidate in-flight work
+        self.cancel_hooks = []
+
+    def add_stage(self, name, handler, maxsize=4, cancellable=None):
+        """Appends a stage; its results feed the stage added after it.
+
+        The first stage receives detector events and is never cancelled; the
+        others are unless cancellable=False, whose work then outlives interrupts.
+        """
+        if cancellable is None:
+            cancellable = bool(self.stages)
+        stage = Stage(self, name, handler, maxsize, cancellable=cancellable)
+        if self.stages:
+            self.stages[-1].next_stage = stage
+        self.stages.append(stage)
+        return stage
+
+    def add_cancel_hook(self, hook):
+        """Registers a callable that aborts in-flight work (a playback, a run) on interrupt()."""
+        self.cancel_hooks.append(hook)
+
+    def submit(self, event):
+        """Queues a detector event for the first stage. Never blocks the caller."""
+        try:
+            self.stages[0].queue.put_nowait((self.generation, event))
+        except queue.Full:
+            print(f"Dropping event, '{self.stages[0].name}' stage is backed up: {event}")
+
+    def is_busy(self):
+        """True while any cancellable stage still has a turn queued or in hand, i.e. there is something to interrupt."""
+        return any(stage.is_busy or stage.in_flight or not stage.queue.empty()
+                   for stage in self.stages if stage.cancellable)
+
+    def interrupt(self):
+        """Abandons the turns in the cancellable stages (barge-in).
+
+        Meant to be called from the first stage, which keeps running so it can
+        start the next turn straight away. Stages that are not cancellable
+        carry on, and pass their results on under the new generation.
+        """
+        self.generation += 1
+        self.stages[0].generation = self.generation
+        for stage in self.stages:
+            if not stage.cancellable:
+                continue
+            stage.drain()
+            stage.cancel_in_flight()
+        for hook in self.cancel_hooks:
+            try:
+                hook()
+            except Exception as e:
+                print(f"Cancel hook failed: {e}")
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        """Stops the stages in pipeline order so in-flight items drain downstream."""
+        for stage in self.stages:
+            stage.stop()
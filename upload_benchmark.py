@@ -0,0 +1,88 @@
+"""Benchmark of compressed recording uploads against raw WAV.
+
+Every recording is pushed through UploadEncoder the way the recorder feeds
+it, 20 ms at a time, in each upload encoding. The report compares ffmpeg CPU
+time against the bytes saved and the upload time that saves at a range of
+uplink speeds. Encoding overlaps the recording in the live assistant, so the
+net figure, which subtracts the whole encode, is a worst case.
+
+Usage:
+    python upload_benchmark.py [WAV_OR_DIR ...] [--uplink-kbps 256 1000 5000]
+"""
+import argparse
+import glob
+import os
+import time
+import wave
+from assemblyai_transcriber import UPLOAD_ENCODINGS, UploadEncoder
+
+try:
+    import resource  # Child CPU time; not available on Windows
+except ImportError:
+    resource = None
+
+def children_cpu():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def encode_file(path, encoding, frame_ms=20):
+    """Returns (raw WAV bytes, encoded bytes, encode CPU seconds, audio seconds) for one recording."""
+    with wave.open(path, 'rb') as wf:
+        rate = wf.getframerate()
+        pcm = wf.readframes(wf.getnframes())
+    frame_bytes = rate * 2 * frame_ms // 1000
+    cpu_before = children_cpu()
+    wall_start = time.perf_counter()
+    encoder = UploadEncoder(encoding, rate)
+    for offset in range(0, len(pcm), frame_bytes):
+        encoder.feed(pcm[offset:offset + frame_bytes])
+    encoded = encoder.finish()
+    # Falls back to wall time where child CPU time cannot be read
+    cpu = children_cpu() - cpu_before if cpu_before is not None else time.perf_counter() - wall_start
+    if encoded is None:
+        raise RuntimeError(f"encoding {path} as {encoding} failed")
+    return 44 + len(pcm), len(encoded), cpu, len(pcm) / (rate * 2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare compressed recording uploads with raw WAV.")
+    parser.add_argument('paths', nargs='*', default=['recorded_audio.wav'],
+                        help="16 kHz mono WAV files or directories of them")
+    parser.add_argument('--encodings', nargs='+', default=list(UPLOAD_ENCODINGS), choices=list(UPLOAD_ENCODINGS))
+    parser.add_argument('--uplink-kbps', nargs='+', type=float, default=[256, 1000, 5000],
+                        help="Uplink speeds to work out upload times for")
+    args = parser.parse_args()
+
+    wav_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            wav_paths += sorted(glob.glob(os.path.join(path, '**', '*.wav'), recursive=True))
+        else:
+            wav_paths.append(path)
+    if not wav_paths:
+        print("No WAV files to benchmark.")
+        return
+
+    for encoding in args.encodings:
+        raw = encoded = cpu = audio = 0
+        for path in wav_paths:
+            r, e, c, a = encode_file(path, encoding)
+            raw += r
+            encoded += e
+            cpu += c
+            audio += a
+        turns = len(wav_paths)
+        print(f"\n{encoding}: {turns} recordings, {audio:.1f} s of audio")
+        print(f"  size    {raw / turns / 1024:8.1f} KiB raw -> {encoded / turns / 1024:8.1f} KiB "
+              f"({encoded / raw:.1%} of raw)")
+        print(f"  encode  {cpu / turns * 1000:8.1f} ms CPU per turn ({cpu / audio:.3f} s per audio second)")
+        print(f"  {'uplink':>10} {'raw upload':>12} {'encoded':>10} {'net saved':>10}  (per turn)")
+        for kbps in args.uplink_kbps:
+            raw_s = raw * 8 / (kbps * 1000) / turns
+            encoded_s = encoded * 8 / (kbps * 1000) / turns
+            net_s = raw_s - encoded_s - cpu / turns
+            print(f"  {kbps:>6.0f} kb/s {raw_s * 1000:>10.0f} ms {encoded_s * 1000:>7.0f} ms {net_s * 1000:>7.0f} ms")
+
+if __name__ == "__main__":
+    main()
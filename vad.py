@@ -0,0 +1,67 @@
+import numpy as np
+from pocketsphinx import Vad
+
+class EnergyGate:
+    """Vectorized energy gate that tells speech-like audio from room noise.
+
+    Frame energies are compared against an adaptive noise floor. A hangover
+    keeps the gate open briefly after the last loud frame so word tails and
+    short pauses inside a keyphrase still get through.
+    """
+
+    def __init__(self, rate=16000, frame_ms=10, threshold_db=12.0, hangover_ms=300, initial_floor_db=-60.0):
+        self.frame_samples = rate * frame_ms // 1000
+        self.threshold_db = threshold_db  # How far above the noise floor counts as speech
+        self.hangover_frames = hangover_ms // frame_ms
+        self.floor_db = initial_floor_db
+        self.hangover_left = 0
+        self.loud_frames = 0  # Total frames above the threshold so far
+
+    def frame_energies(self, pcm):
+        """Returns the energy in dBFS of each whole frame in int16 PCM."""
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        usable = len(samples) - len(samples) % self.frame_samples
+        frames = samples[:usable].reshape(-1, self.frame_samples).astype(np.float32) / 32768.0
+        return 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+    def is_speech(self, pcm):
+        """Returns True while the chunk, or the hangover after it, should be decoded."""
+        energies = self.frame_energies(pcm)
+        loud = energies > self.floor_db + self.threshold_db
+        self.loud_frames += int(loud.sum())
+        for energy, is_loud in zip(energies, loud):
+            # Track the floor quickly through quiet frames, and only creep up through
+            # loud ones so a new steady noise source is eventually absorbed
+            self.floor_db += (0.002 if is_loud else 0.05) * (energy - self.floor_db)
+        if loud.any():
+            self.hangover_left = self.hangover_frames
+        else:
+            self.hangover_left = max(0, self.hangover_left - len(energies))
+        return bool(loud.any()) or self.hangover_left > 0
+
+class SpeechGate:
+    """Keyword spotter gate on the WebRTC voice activity detector that pocketsphinx's Endpointer uses.
+
+    EnergyGate opens only once a word gets loud, so keywords with a soft onset
+    lose their start and are missed; the VAD scores each frame's spectrum, so
+    it opens on quiet speech too while still rejecting steady room noise. A
+    hangover keeps it open through the short pauses inside a keyphrase.
+    """
+
+    def __init__(self, rate=16000, frame_ms=20, mode=Vad.MEDIUM_LOOSE, hangover_ms=300):
+        self.vad = Vad(mode=mode, sample_rate=rate, frame_length=frame_ms / 1000)
+        self.frame_bytes = self.vad.frame_bytes
+        self.hangover_frames = hangover_ms // frame_ms
+        self.hangover_left = 0
+        self.speech_frames = 0  # Total frames the VAD took for speech so far
+
+    def is_speech(self, pcm):
+        """Returns True while the chunk, or the hangover after it, should be decoded."""
+        pcm = bytes(pcm)
+        for offset in range(0, len(pcm) - self.frame_bytes + 1, self.frame_bytes):
+            if self.vad.is_speech(pcm[offset:offset + self.frame_bytes]):
+                self.speech_frames += 1
+                self.hangover_left = self.hangover_frames
+            else:
+                self.hangover_left = max(0, self.hangover_left - 1)
+        return self.hangover_left > 0
@@ -1,45 +1,296 @@
 import os
-from pocketsphinx import LiveSpeech, get_model_path
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from pocketsphinx import Decoder, Endpointer, get_model_path
+from capture_bus import get_bus, SAMPLE_RATE, SAMPLE_WIDTH
+from vad import SpeechGate
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # Get the directory of the script
+KWS_PATH = os.path.join(script_dir, 'keywords.kws')  # Path to your keywords.kws file
 
 # Placeholder for the message handler function, set by main_controller.py
 message_handler = None
 
+# Spotter threads started by setup_keyword_detection(); each ends when its bus stops
+spotter_threads = []
+
 def set_message_handler(handler):
     global message_handler
     message_handler = handler
 
-def setup_keyword_detection():
+class KeywordEvent:
+    """A detected keyphrase. Sample positions count from the start of the audio stream."""
+
+    def __init__(self, keyphrase, start_sample, end_sample, detected_sample, latency, device=None):
+        self.keyphrase = keyphrase
+        self.device = device  # Input device the keyphrase was heard on, None for the default microphone
+        self.start_sample = start_sample
+        self.end_sample = end_sample
+        self.detected_sample = detected_sample
+        self.latency = latency  # Seconds of audio between the end of the keyphrase and its detection
+        self.timestamp = time.time()
+
+    def __repr__(self):
+        return f"KeywordEvent({self.keyphrase!r}, latency={self.latency * 1000:.0f} ms)"
+
+def read_kws(kws_path):
+    """Returns [(keyphrase, threshold)] from a kws file."""
+    entries = []
+    with open(kws_path) as f:
+        for line in f:
+            match = re.match(r'\s*(.+?)\s*/(.+)/\s*$', line)
+            if match:
+                entries.append((match.group(1), float(match.group(2))))
+    return entries
+
+def load_lexicon(dict_path=None):
+    """Reads a pronunciation dictionary into {word: [phones, ...]}."""
+    lexicon = {}
+    with open(dict_path if dict_path else get_model_path('en-us/cmudict-en-us.dict')) as f:
+        for line in f:
+            word, _, phones = line.strip().partition(' ')
+            # Alternate pronunciations are listed as word(2), word(3), ...
+            lexicon.setdefault(re.sub(r'\(\d+\)$', '', word), []).append(phones.strip())
+    return lexicon
+
+def create_decoder(kws_path=KWS_PATH, rate=SAMPLE_RATE, lexicon=None):
+    """Loads the en-us acoustic model with a keyword search over kws_path.
+
+    Given a lexicon, the decoder only gets a dictionary of the keyword words
+    instead of parsing the full one. The full dictionary is most of a
+    decoder's memory, so this keeps each extra decoder down to roughly its
+    acoustic model.
+    """
     model_path = get_model_path()
-    script_dir = os.path.dirname(os.path.abspath(__file__))  # Get the directory of the script
-    kws_path = os.path.join(script_dir, 'keywords.kws')  # Path to your keywords.kws file
+    config = dict(hmm=os.path.join(model_path, 'en-us/en-us'), lm=None, kws=kws_path, samprate=rate)
+    if lexicon is None:
+        return Decoder(**config)
+
+    words = {word for phrase, _ in read_kws(kws_path) for word in phrase.split()}
+    with tempfile.NamedTemporaryFile('w', suffix='.dict', delete=False) as f:
+        for word in sorted(words):
+            for i, phones in enumerate(lexicon.get(word, [])):
+                f.write(f"{word}{f'({i + 1})' if i else ''} {phones}\n")
+    try:
+        return Decoder(dict=f.name, **config)
+    finally:
+        os.remove(f.name)
+
+class KeywordSpotter:
+    """Drives a kws Decoder directly in small hops and reports each keyphrase as
+    soon as its hypothesis appears, rather than when the utterance ends.
+
+    The Endpointer only tracks speech state here so utterances can be closed at
+    pauses; every hop goes straight to the decoder without waiting on it.
+
+    With a gate (see vad.SpeechGate), hops it rejects skip the decoder entirely.
+    The last few rejected hops are kept and replayed when it opens, so the
+    onset of a keyword is not clipped.
+
+    With kws_path set, run() watches that file and swaps a new kws search into
+    the already-loaded decoder when it changes, keeping the model and the
+    capture stream as they are. A decoder built with a keyword-only
+    dictionary needs the lexicon to learn words added to the file.
+    """
+
+    def __init__(self, decoder, callback, rate=SAMPLE_RATE, hop_ms=20, gate=None, gate_preroll_ms=200,
+                 kws_path=None, reload_interval=1.0, lexicon=None, device=None):
+        if hop_ms not in (10, 20, 30):
+            raise ValueError("hop_ms must be 10, 20 or 30 (the VAD frame sizes)")
+        self.decoder = decoder
+        self.callback = callback  # Called with a KeywordEvent for each detection
+        self.rate = rate
+        self.endpointer = Endpointer(sample_rate=rate, frame_length=hop_ms / 1000)
+        self.hop_samples = self.endpointer.frame_bytes // SAMPLE_WIDTH
+        self.frame_samples = rate // int(decoder.config['frate'])  # Samples per decoder frame
+        self.position = 0  # Stream position of the next sample; run() starts it at the reader's
+        self.utt_start = None  # Stream position of the current utterance's first sample
+        self.gate = gate
+        self.gated_hops = deque(maxlen=max(1, gate_preroll_ms // hop_ms))
+        self.kws_path = kws_path
+        self.kws_mtime = os.path.getmtime(kws_path) if kws_path else None
+        self.reload_interval = reload_interval  # Seconds between checks of the kws file
+        self.search_generation = 0
+        self.lexicon = lexicon
+        self.device = device  # Stamped on every KeywordEvent
 
-    print(f"Model Path: {model_path}")
-    print(f"Keywords File Path: {kws_path}")
+    def process(self, pcm, lag_samples=0):
+        """Feeds one hop of int16 PCM. lag_samples is how far the caller is behind
+        the live input, so reported latency covers buffering as well as decoding."""
+        if self.gate is not None and not self.gate.is_speech(pcm):
+            if self.utt_start is not None:
+                self._report(lag_samples)
+            self.gated_hops.append(bytes(pcm))
+            self.position += len(pcm) // SAMPLE_WIDTH
+            return
+        if self.utt_start is None:
+            self.decoder.start_utt()
+            self.utt_start = self.position
+            # Replay the audio held back while the gate was closed
+            for held in self.gated_hops:
+                self.utt_start -= len(held) // SAMPLE_WIDTH
+                self.decoder.process_raw(held)
+            self.gated_hops.clear()
+        self.decoder.process_raw(pcm)
+        self.position += len(pcm) // SAMPLE_WIDTH
+        was_in_speech = self.endpointer.in_speech
+        self.endpointer.process(pcm)
 
+        if self.decoder.hyp() is not None:
+            self._report(lag_samples)
+        elif was_in_speech and not self.endpointer.in_speech:
+            # Close utterances at pauses so decoder state does not grow without bound
+            self._end_utterance()
+
+    def finish(self):
+        """Closes any open utterance at the end of the input, reporting what it held."""
+        if self.utt_start is not None:
+            self._report(0)
+
+    def skip(self, samples):
+        """Moves past audio that was never fed (e.g. a reader overrun), closing any open utterance."""
+        if self.utt_start is not None:
+            self._report(0)
+        self.gated_hops.clear()
+        self.position += samples
+
+    def run(self, reader):
+        """Spots keywords on a capture reader until its bus stops.
+
+        Positions follow the reader's, so reported samples are capture bus
+        positions, the same ones recordings are cut by.
+        """
+        self.position = reader.position
+        next_check = time.monotonic() + self.reload_interval
+        while True:
+            pcm = reader.read_exact(self.hop_samples)
+            if pcm is None:
+                break
+            skipped = reader.position - self.hop_samples - self.position
+            if skipped:
+                self.skip(skipped)  # The reader fell a whole ring behind and jumped ahead
+            self.process(pcm, lag_samples=reader.bus.position - reader.position)
+            if self.kws_path and time.monotonic() >= next_check:
+                next_check = time.monotonic() + self.reload_interval
+                self.check_keywords()
+        self.finish()
+
+    def check_keywords(self):
+        """Reloads the keyword list if the watched kws file has changed."""
+        try:
+            mtime = os.path.getmtime(self.kws_path)
+        except OSError:
+            return
+        if mtime != self.kws_mtime:
+            self.kws_mtime = mtime
+            self.reload_keywords()
+
+    def reload_keywords(self):
+        """Builds a kws search from kws_path on the loaded decoder and activates it.
+
+        An invalid file leaves the current search in place. Returns True on success.
+        """
+        try:
+            entries = read_kws(self.kws_path)
+        except (OSError, ValueError) as e:
+            print(f"Failed to read keywords from {self.kws_path}: {e}")
+            return False
+        words = {word for phrase, _ in entries for word in phrase.split()}
+        if self.lexicon:
+            for word in words:
+                if self.decoder.lookup_word(word) is None:
+                    for i, phones in enumerate(self.lexicon.get(word, [])):
+                        self.decoder.add_word(f"{word}({i + 1})" if i else word, phones, True)
+        missing = sorted(word for word in words if self.decoder.lookup_word(word) is None)
+        if not entries or missing:
+            print(f"Keeping current keywords, {self.kws_path} is empty or has unknown words: {missing}")
+            return False
+
+        # Searches can only be switched between utterances
+        if self.utt_start is not None:
+            self._report(0)
+        old_search = self.decoder.current_search()
+        self.search_generation += 1
+        search = f"kws_{self.search_generation}"
+        try:
+            self.decoder.add_kws(search, self.kws_path)
+            self.decoder.activate_search(search)
+        except Exception as e:
+            # A bad reload must not take the spotter thread down with it
+            print(f"Failed to build a keyword search from {self.kws_path}, keeping current keywords: {e!r}")
+            return False
+        self.decoder.remove_search(old_search)
+        print(f"Reloaded keywords: {[phrase for phrase, _ in entries]}")
+        return True
+
+    def _report(self, lag_samples):
+        utt_start = self.utt_start
+        self._end_utterance()
+        if self.decoder.hyp() is None:
+            return
+        for seg in self.decoder.seg():
+            start_sample = utt_start + seg.start_frame * self.frame_samples
+            end_sample = utt_start + (seg.end_frame + 1) * self.frame_samples
+            latency = (self.position + lag_samples - end_sample) / self.rate
+            self.callback(KeywordEvent(seg.word.strip(), start_sample, end_sample, self.position, latency, self.device))
+
+    def _end_utterance(self):
+        self.decoder.end_utt()
+        self.utt_start = None
+
+def on_keyword(event):
+    print(f"Detected keyword: {event} on device {event.device}")  # Log for debugging
+    # If a message handler is set, call it with the detection
+    if message_handler:
+        message_handler(event)
+
+def setup_keyword_detection(devices=None, hop_ms=20, use_gate=False):
+    """Spots keywords on each input device (None is the default microphone) until capture stops.
+
+    Each device gets its own lightweight decoder and spotter thread, reading the
+    device's shared capture bus. use_gate puts a SpeechGate in front of each
+    decoder, so it only runs while someone is talking, which keeps idle CPU low
+    on small machines (kws_benchmark.py --gate and --idle measure this).
+    """
+    devices = devices if devices else [None]
+    print(f"Model Path: {get_model_path()}")
+    print(f"Keywords File Path: {KWS_PATH}")
+
+    # With several devices, parse the pronunciation dictionary once here rather
+    # than once inside every decoder
+    lexicon = load_lexicon() if len(devices) > 1 else None
+    spotters = []
     try:
-        speech = LiveSpeech(
-            verbose=False,  # Set to True for detailed logs from PocketSphinx
-            sampling_rate=16000,
-            buffer_size=256,
-            no_search=False,
-            full_utt=False,
-            hmm=os.path.join(model_path, 'en-us/en-us'),
-            lm=None,
-            kws=kws_path
-        )
+        for device in devices:
+            bus = get_bus(device)  # Reads the shared microphone capture instead of opening its own stream
+            decoder = create_decoder(rate=bus.rate, lexicon=lexicon)
+            # Optionally skip decoder work on non-speech audio to keep idle CPU low
+            gate = SpeechGate(rate=bus.rate, frame_ms=hop_ms) if use_gate else None
+            spotters.append((bus, KeywordSpotter(decoder, on_keyword, rate=bus.rate, hop_ms=hop_ms, gate=gate,
+                                                 kws_path=KWS_PATH, lexicon=lexicon, device=device)))
         print("PocketSphinx initialized successfully.")
         print("Listening for keywords...")
     except Exception as e:
         print(f"Failed to initialize PocketSphinx: {e}")
         return
 
-    for phrase in speech:
-        detected_words = [seg[0] for seg in phrase.segments(detailed=True)]  # Extract words
-        print(f"Detected words: {detected_words}")  # Log for debugging
-        
-        # If a message handler is set, call it with the detected words
-        if message_handler:
-            message_handler(detected_words)
+    threads = []
+    for bus, spotter in spotters:
+        bus.start()
+        thread = threading.Thread(target=spotter.run, args=(bus.open_reader(),), name=f"spotter-{spotter.device}")
+        thread.start()
+        threads.append(thread)
+        spotter_threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+def join_spotters(timeout=5.0):
+    """Waits for the spotter threads to finish, once their buses have been stopped."""
+    for thread in spotter_threads:
+        thread.join(timeout)
 
 if __name__ == "__main__":
-    setup_keyword_detection()
\ No newline at end of file
+    setup_keyword_detection()